@@ -0,0 +1,273 @@
+# api_server.py
+"""HTTP API for the agents, for clients other than the Streamlit app.
+
+    API_KEY=... uvicorn api_server:app --host 127.0.0.1 --port 8000 --workers 4
+
+Processes share nothing but Mongo, so the service scales out behind a load
+balancer. Agent endpoints answer with JSON, or with Server-Sent Events when
+asked to stream: one `data: {"text": ...}` event per chunk, then `event: done`.
+
+Every agent endpoint requires the X-API-Key header to match API_KEY, and the
+server refuses to start without it. The key grants access to every patient's
+data, so it belongs to trusted backends (the app server, partner services),
+never to end-user devices; those must authenticate the user and call through
+such a backend. The email in a request body is not proof of identity.
+"""
+import asyncio
+import hmac
+import io
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import APIRouter, Depends, FastAPI, File, Header, HTTPException, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from PIL import Image, UnidentifiedImageError
+from pydantic import BaseModel
+
+import db_async
+import llm
+import ocr
+import semantic_cache
+from chat_log import log_chat
+from diagnosis_agent import adiagnose_patient_stream
+from diet_agent import asuggest_diet_stream
+from faq_generator import agenerate_faqs
+from llm_metrics import register_gauges, render_prometheus
+from medicine_index import medicine_index
+from patient_context import load_patient_context
+from report_analyser import MAX_REPORT_BYTES, was_truncated
+from report_cache import aanalyze_uploaded_report
+from routine_agent import asuggest_routine_stream
+from sidebar_chatbot3 import chat, chat_prompt
+from tablet_analyser import amedicine_description_stream
+
+# Requests handled at once per process; a streamed response keeps its slot until the stream ends.
+MAX_CONCURRENT_REQUESTS = int(os.getenv("API_MAX_CONCURRENCY", 64))
+# How long a request may wait for a slot before getting 503.
+QUEUE_TIMEOUT = float(os.getenv("API_QUEUE_TIMEOUT", 10))
+MAX_IMAGE_BYTES = int(os.getenv("API_MAX_IMAGE_BYTES", 10 * 1024 * 1024))
+API_KEY = os.getenv("API_KEY")
+if not API_KEY:
+    raise RuntimeError("API_KEY is not set; the API server exposes patient data and will not run without it.")
+UNLIMITED_PATHS = {"/health", "/metrics"}
+PATIENT_FIELDS = {"_id": 0, "name": 1, "symptoms": 1, "conditions": 1}
+RUN_CONFIG = {"metadata": {"agent": "api_server"}}
+
+_slots = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+stats = {"active": 0, "served": 0, "rejected": 0}
+register_gauges("api", lambda: dict(stats))
+
+
+class ConcurrencyLimit:
+    """ASGI middleware capping in-flight requests at MAX_CONCURRENT_REQUESTS."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in UNLIMITED_PATHS:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await asyncio.wait_for(_slots.acquire(), QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            stats["rejected"] += 1
+            response = JSONResponse(
+                {"detail": "Server busy, retry later."}, status_code=503, headers={"Retry-After": "1"}
+            )
+            await response(scope, receive, send)
+            return
+        stats["active"] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            stats["active"] -= 1
+            stats["served"] += 1
+            _slots.release()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    semantic_cache.warm()
+    await asyncio.to_thread(ocr.warm)
+    yield
+    await llm.aclose_all()
+
+
+def check_api_key(x_api_key: str = Header(default=None)):
+    if not x_api_key or not hmac.compare_digest(x_api_key.encode("utf-8"), API_KEY.encode("utf-8")):
+        raise HTTPException(status_code=401, detail="Invalid or missing API key.")
+
+
+app = FastAPI(title="Health Assistant API", lifespan=lifespan)
+app.add_middleware(ConcurrencyLimit)
+router = APIRouter(dependencies=[Depends(check_api_key)])
+
+
+class PatientRequest(BaseModel):
+    name: str
+    email: str
+    stream: bool = False
+
+
+class FaqRequest(BaseModel):
+    content: str
+
+
+class ChatRequest(BaseModel):
+    email: str
+    question: str
+    stream: bool = False
+
+
+def _event(data, event=None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+def _sse(pieces, meta=None):
+    async def events():
+        if meta:
+            yield _event(meta, "meta")
+        try:
+            async for piece in pieces:
+                if piece:
+                    yield _event({"text": piece})
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band.
+            yield _event({"detail": str(e)}, "error")
+            return
+        yield _event({}, "done")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _respond(pieces, stream, meta=None):
+    if stream:
+        return _sse(pieces, meta)
+    return {**(meta or {}), "text": "".join([piece async for piece in pieces])}
+
+
+async def _patient(name, email):
+    patient = await db_async.patients_collection.find_one({"name": name, "email": email}, PATIENT_FIELDS)
+    if not patient:
+        raise HTTPException(status_code=404, detail="Patient not found.")
+    return patient
+
+
+@router.post("/diagnosis")
+async def diagnosis(body: PatientRequest):
+    patient = await _patient(body.name, body.email)
+    return await _respond(adiagnose_patient_stream(body.name, body.email, patient), body.stream)
+
+
+@router.post("/diet")
+async def diet(body: PatientRequest):
+    patient = await _patient(body.name, body.email)
+    return await _respond(asuggest_diet_stream(body.name, body.email, patient), body.stream)
+
+
+@router.post("/routine")
+async def routine(body: PatientRequest):
+    patient = await _patient(body.name, body.email)
+    return await _respond(asuggest_routine_stream(body.name, body.email, patient), body.stream)
+
+
+@router.post("/faqs")
+async def faqs(body: FaqRequest):
+    return {"faqs": await agenerate_faqs(body.content)}
+
+
+@router.post("/report")
+async def report(file: UploadFile = File(...)):
+    data = await file.read(MAX_REPORT_BYTES + 1)
+    if len(data) > MAX_REPORT_BYTES:
+        raise HTTPException(status_code=413, detail="The file is too large to analyze.")
+    upload = io.BytesIO(data)
+    upload.name = file.filename or "report.txt"
+    try:
+        report_text, analysis, cached = await aanalyze_uploaded_report(upload)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if not analysis:
+        raise HTTPException(status_code=422, detail="No text could be extracted from the report.")
+    return {"analysis": analysis, "cached": cached, "truncated": was_truncated(report_text)}
+
+
+async def _once(text):
+    yield text
+
+
+async def _describe(text):
+    parts = []
+    async for piece in amedicine_description_stream(text):
+        parts.append(piece)
+        yield piece
+    await asyncio.to_thread(medicine_index.add, text, "".join(parts))
+
+
+@router.post("/tablet")
+async def tablet(file: UploadFile = File(...), stream: bool = False):
+    data = await file.read(MAX_IMAGE_BYTES + 1)
+    if len(data) > MAX_IMAGE_BYTES:
+        raise HTTPException(status_code=413, detail="The image is too large.")
+    try:
+        image = Image.open(io.BytesIO(data)).convert("RGB")
+    except UnidentifiedImageError:
+        raise HTTPException(status_code=422, detail="Failed to open image.")
+    text = (await asyncio.to_thread(ocr.extract_text, image)).strip().replace("\n", " ")
+    if not text:
+        raise HTTPException(status_code=422, detail="Could not extract any text from the image.")
+
+    hit = await asyncio.to_thread(medicine_index.lookup, text)
+    if hit:
+        return await _respond(_once(hit[0]["description"]), stream, {"extracted_text": text, "from_index": True})
+    return await _respond(_describe(text), stream, {"extracted_text": text, "from_index": False})
+
+
+async def _chat(email, question, context):
+    context_fp = semantic_cache.context_fingerprint(context)
+    answer, vector = await asyncio.to_thread(semantic_cache.lookup, email, question, context_fp)
+    if answer is not None:
+        yield answer
+    else:
+        started = time.perf_counter()
+        parts = []
+        async for chunk in (chat_prompt | chat).astream({"context": context, "question": question}, config=RUN_CONFIG):
+            parts.append(chunk.content)
+            yield chunk.content
+        answer = "".join(parts)
+        semantic_cache.store(email, question, context_fp, answer, time.perf_counter() - started, vector)
+    log_chat(email, question, answer)
+
+
+@router.post("/chat")
+async def chat_endpoint(body: ChatRequest):
+    entry = await asyncio.to_thread(load_patient_context, body.email)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Patient not found.")
+    return await _respond(_chat(body.email, body.question, entry["context"]), body.stream)
+
+
+app.include_router(router)
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", **stats}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return render_prometheus()
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("api_server:app", host=os.getenv("API_HOST", "127.0.0.1"), port=int(os.getenv("API_PORT", 8000)))
@@ -0,0 +1,153 @@
+# appointments.py
+import os
+import threading
+import time
+from datetime import datetime
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+
+from db import appointments_collection
+from profiler import profiled
+
+# Native datetime copy of the ISO 'start' string, so range queries and sorts run server-side.
+START_FIELD = "start_at"
+APPOINTMENT_FIELDS = {"_id": 0, "title": 1, START_FIELD: 1}
+SUMMARY_LIMIT = 50
+# How long a user's appointments count as backfilled; catches writes from code that skips with_start_at.
+BACKFILL_TTL = int(os.getenv("APPOINTMENT_BACKFILL_TTL", 300))
+MAX_BACKFILLED = 10000
+
+_backfilled = {}     # email -> time.monotonic() of the last backfill
+_backfilled_lock = threading.Lock()
+
+
+def parse_start(value):
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        dt = datetime.fromisoformat(value)
+    # Store local naive times, matching how the app compares against datetime.now().
+    if dt.tzinfo is not None:
+        dt = dt.astimezone().replace(tzinfo=None)
+    return dt
+
+
+def with_start_at(appointment: dict) -> dict:
+    """Return the appointment with START_FIELD filled in; use before inserting or updating."""
+    if 'start' in appointment:
+        appointment = dict(appointment, **{START_FIELD: parse_start(appointment['start'])})
+    return appointment
+
+
+def _backfill(query, batch_size=500):
+    ops, updated = [], 0
+    cursor = appointments_collection.find(
+        {**query, START_FIELD: {"$exists": False}, "start": {"$exists": True}}, {"_id": 1, "start": 1}
+    )
+    for doc in cursor:
+        try:
+            start_at = parse_start(doc["start"])
+        except (TypeError, ValueError):
+            # Recorded as null so it is not fetched again; queries only match real dates.
+            start_at = None
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {START_FIELD: start_at}}))
+        if len(ops) >= batch_size:
+            updated += appointments_collection.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        updated += appointments_collection.bulk_write(ops, ordered=False).modified_count
+    return updated
+
+
+def backfill_start_at(batch_size=500):
+    """Populate START_FIELD on appointments written before it existed. Safe to re-run."""
+    return _backfill({}, batch_size)
+
+
+def backfill_email(email):
+    """Populate START_FIELD on this user's appointments that lack it.
+
+    Appointments are also written by code that never calls with_start_at, so every
+    query below runs this first. It hits Mongo at most once per BACKFILL_TTL per
+    user, or again after forget_backfill(email).
+    """
+    now = time.monotonic()
+    with _backfilled_lock:
+        done = _backfilled.get(email)
+        if done is not None and now - done < BACKFILL_TTL:
+            return 0
+        if len(_backfilled) >= MAX_BACKFILLED:
+            _backfilled.clear()
+        _backfilled[email] = now
+    return _backfill({"email": email})
+
+
+def forget_backfill(email):
+    """Make the next query for this user backfill again; call after writing their appointments."""
+    with _backfilled_lock:
+        _backfilled.pop(email, None)
+
+
+@profiled("db:next_appointment")
+def next_appointment(email, now=None):
+    """The first appointment after `now`, via one indexed, sorted, limit-1 query."""
+    backfill_email(email)
+    return appointments_collection.find_one(
+        {"email": email, START_FIELD: {"$gt": now or datetime.now()}},
+        APPOINTMENT_FIELDS,
+        sort=[(START_FIELD, ASCENDING)],
+    )
+
+
+@profiled("db:appointment_page")
+def appointment_page(email, limit=SUMMARY_LIMIT, skip=0):
+    """Up to `limit` of the user's latest appointments (past or future), oldest first."""
+    backfill_email(email)
+    cursor = (
+        appointments_collection.find({"email": email, START_FIELD: {"$type": "date"}}, APPOINTMENT_FIELDS)
+        .sort(START_FIELD, DESCENDING)
+        .skip(skip)
+        .limit(limit)
+    )
+    return list(reversed(list(cursor)))
+
+
+@profiled("db:upcoming_appointments")
+def upcoming_appointments(email, now=None, limit=10):
+    """The next `limit` appointments after `now`, soonest first."""
+    backfill_email(email)
+    cursor = (
+        appointments_collection.find({"email": email, START_FIELD: {"$gt": now or datetime.now()}}, APPOINTMENT_FIELDS)
+        .sort(START_FIELD, ASCENDING)
+        .limit(limit)
+    )
+    return list(cursor)
+
+
+@profiled("db:recent_appointments")
+def recent_appointments(email, since, now=None, limit=10):
+    """Up to `limit` appointments between `since` and `now`, oldest first."""
+    backfill_email(email)
+    cursor = (
+        appointments_collection.find(
+            {"email": email, START_FIELD: {"$gte": since, "$lte": now or datetime.now()}}, APPOINTMENT_FIELDS
+        )
+        .sort(START_FIELD, DESCENDING)
+        .limit(limit)
+    )
+    return list(reversed(list(cursor)))
+
+
+def describe_next_appointment(apt):
+    if not apt:
+        return "You have no upcoming appointments at the moment."
+    apt_time = apt[START_FIELD].strftime("%A at %I:%M %p")
+    apt_title = apt.get("title", "No title provided")
+    return f"Your next appointment is '{apt_title}' scheduled for {apt_time}."
+
+
+def format_appointment_summary(appointments):
+    return "\n".join([
+        f"- {a.get('title', 'No title')} on {a[START_FIELD].strftime('%Y-%m-%d %I:%M %p')}"
+        for a in appointments
+    ]) or "No appointments on record."
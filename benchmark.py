@@ -0,0 +1,408 @@
+# benchmark.py
+"""Offline benchmark for the app's core functions.
+
+ChatGroq is replaced by a deterministic fake with configurable latency and
+token rate, and the Mongo collections by mongomock (or a small in-memory
+stand-in), so no Groq key or database is needed:
+
+    python benchmark.py --iterations 20 --latency 0.3 --tokens-per-second 300
+    python benchmark.py --save baselines/bench.json
+    python benchmark.py --compare baselines/bench.json --tolerance 0.2
+"""
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+from datetime import datetime, timedelta
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+WORDS = ("rest hydrate walk sleep protein fibre vitamin check blood pressure sugar heart "
+         "monitor doctor follow-up breathe stretch balance meal vegetables fruit water").split()
+
+
+# ---------------------------------------------------------------- fake LLM
+
+class FakeChat(BaseChatModel):
+    """Deterministic stand-in for ChatGroq: same prompt, same answer, fixed timing."""
+
+    model_name: str = "fake"
+    latency: float = 0.2            # seconds before the first token
+    tokens_per_second: float = 200.0
+    completion_tokens: int = 120
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    def _text(self, messages):
+        prompt = "\n".join(str(m.content) for m in messages)
+        rng = random.Random(prompt)
+        if "Return strictly as JSON" in prompt:
+            return json.dumps([
+                {"question": f"What does {rng.choice(WORDS)} mean for me?", "answer": " ".join(rng.choices(WORDS, k=12))}
+                for _ in range(4)
+            ])
+        return " ".join(rng.choices(WORDS, k=self.completion_tokens))
+
+    def _usage(self, messages, text):
+        prompt_tokens = sum(len(str(m.content)) for m in messages) // 4
+        completion = len(text.split())
+        return {"input_tokens": prompt_tokens, "output_tokens": completion, "total_tokens": prompt_tokens + completion}
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        text = self._text(messages)
+        time.sleep(self.latency + len(text.split()) / self.tokens_per_second)
+        message = AIMessage(content=text, usage_metadata=self._usage(messages, text))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        text = self._text(messages)
+        time.sleep(self.latency)
+        for word in text.split(" "):
+            time.sleep(1 / self.tokens_per_second)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+# ---------------------------------------------------------------- fake Mongo
+
+def _get(doc, dotted):
+    for part in dotted.split("."):
+        if not isinstance(doc, dict) or part not in doc:
+            return None, False
+        doc = doc[part]
+    return doc, True
+
+
+def _matches(doc, query):
+    for key, cond in query.items():
+        value, present = _get(doc, key)
+        if isinstance(cond, dict) and any(k.startswith("$") for k in cond):
+            for op, arg in cond.items():
+                if op == "$exists" and present != bool(arg):
+                    return False
+                if op == "$type" and not (arg == "date" and isinstance(value, datetime)):
+                    return False
+                if op in ("$gt", "$gte", "$lt", "$lte") and (not present or value is None):
+                    return False
+                if op == "$gt" and not value > arg:
+                    return False
+                if op == "$gte" and not value >= arg:
+                    return False
+                if op == "$lt" and not value < arg:
+                    return False
+                if op == "$lte" and not value <= arg:
+                    return False
+                if op == "$in" and value not in arg:
+                    return False
+                if op == "$regex" and not (isinstance(value, str) and re.search(arg, value)):
+                    return False
+        elif not present or value != cond:
+            return False
+    return True
+
+
+def _project(doc, projection):
+    if not projection:
+        return deepcopy(doc)
+    include = {k for k, v in projection.items() if v and k != "_id"}
+    if include:
+        out = {k: deepcopy(doc[k]) for k in include if k in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            out["_id"] = doc["_id"]
+        return out
+    return {k: deepcopy(v) for k, v in doc.items() if projection.get(k, 1)}
+
+
+class _Cursor:
+    def __init__(self, docs, projection):
+        self._docs, self._projection = docs, projection
+        self._skip, self._limit = 0, 0
+
+    def sort(self, key, direction=1):
+        keys = key if isinstance(key, list) else [(key, direction)]
+        for k, d in reversed(keys):
+            self._docs.sort(key=lambda doc: (_get(doc, k)[0] is None, _get(doc, k)[0]), reverse=d < 0)
+        return self
+
+    def skip(self, n):
+        self._skip = n
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def __iter__(self):
+        docs = self._docs[self._skip:]
+        if self._limit:
+            docs = docs[:self._limit]
+        return iter([_project(d, self._projection) for d in docs])
+
+
+class _Database:
+    def __init__(self):
+        self._collections = {}
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = InMemoryCollection(name, self)
+        return self._collections[name]
+
+
+class InMemoryCollection:
+    """Just enough of pymongo's Collection for the code paths benchmarked here."""
+
+    def __init__(self, name, database):
+        self.name, self.database = name, database
+        self._docs = []
+        self._next_id = 0
+
+    def _with_id(self, doc):
+        doc = deepcopy(doc)
+        if "_id" not in doc:
+            self._next_id += 1
+            doc["_id"] = self._next_id
+        return doc
+
+    def insert_one(self, doc):
+        self._docs.append(self._with_id(doc))
+
+    def insert_many(self, docs, ordered=True):
+        self._docs.extend(self._with_id(d) for d in docs)
+
+    def find(self, query=None, projection=None):
+        return _Cursor([d for d in self._docs if _matches(d, query or {})], projection)
+
+    def find_one(self, query=None, projection=None, sort=None):
+        cursor = self.find(query, projection)
+        if sort:
+            cursor.sort(sort)
+        return next(iter(cursor.limit(1)), None)
+
+    def update_one(self, query, update, upsert=False):
+        for doc in self._docs:
+            if _matches(doc, query):
+                doc.update(deepcopy(update.get("$set", {})))
+                return
+        if upsert:
+            self.insert_one({**{k: v for k, v in query.items() if not isinstance(v, dict)}, **update.get("$set", {})})
+
+    def find_one_and_update(self, query, update, projection=None):
+        self.update_one(query, update)
+        return self.find_one(query, projection)
+
+    def delete_many(self, query):
+        self._docs = [d for d in self._docs if not _matches(d, query)]
+
+    def create_index(self, keys, **kwargs):
+        return "_".join(f"{k}_{d}" for k, d in keys)
+
+
+def make_database():
+    try:
+        import mongomock
+        return mongomock.MongoClient()["bench"]
+    except ImportError:
+        return _Database()
+
+
+# ---------------------------------------------------------------- wiring
+
+def install_fakes(latency, tokens_per_second):
+    """Swap in the fake LLM and database before any app module is imported."""
+    os.environ.setdefault("FAQ_CACHE_DIR", tempfile.mkdtemp(prefix="bench-faq-"))
+    os.environ["SEMANTIC_CACHE"] = "0"
+
+    database = make_database()
+    db = types.ModuleType("db")
+    db.patients_collection = database["patients"]
+    db.appointments_collection = database["appointments"]
+    db.records_collection = database["records"]
+    sys.modules["db"] = db
+
+    import llm
+    fakes = {}
+
+    def fake_get_chat(model_name, temperature=0):
+        key = (model_name, float(temperature))
+        if key not in fakes:
+            fakes[key] = FakeChat(model_name=model_name, latency=latency, tokens_per_second=tokens_per_second)
+        return fakes[key]
+
+    llm.get_chat = fake_get_chat
+    return db
+
+
+def seed_patients(db, sizes):
+    """One synthetic patient per history size: that many appointments and chat records."""
+    from appointments import START_FIELD
+    now = datetime.now()
+    patients = []
+    for size in sizes:
+        email = f"patient{size}@bench.local"
+        name = f"Patient {size}"
+        db.patients_collection.insert_one({
+            "name": name, "email": email, "age": 40, "gender": "other",
+            "symptoms": ["fatigue", "headache", "dizziness"][: 1 + size % 3],
+            "conditions": ["hypertension", "type 2 diabetes"],
+            "medications": ["metformin", "amlodipine"],
+        })
+        for i in range(size):
+            start = now + timedelta(days=i - size // 2, hours=i % 8)
+            db.appointments_collection.insert_one({
+                "email": email, "title": f"Visit {i}", "start": start.isoformat(), START_FIELD: start,
+            })
+            db.records_collection.insert_one({
+                "email": email, "question": f"Question {i}?", "answer": f"Answer {i}.",
+                "timestamp": now - timedelta(minutes=size - i),
+            })
+        patients.append((size, name, email))
+    return patients
+
+
+def synthetic_report(pages):
+    rng = random.Random(pages)
+    return "\f".join(
+        "\n".join(f"{w.title()} level: {rng.randint(50, 200)} mg/dL (ref 70-140)" for w in rng.choices(WORDS, k=60))
+        for _ in range(pages)
+    )
+
+
+def synthetic_strip_image():
+    from PIL import Image, ImageDraw
+    image = Image.new("RGB", (1800, 900), "white")
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(["PARACETAMOL TABLETS IP 650 mg", "Each tablet contains", "Paracetamol IP 650 mg"]):
+        draw.text((100, 150 + i * 150), line, fill="black")
+    return image
+
+
+# ---------------------------------------------------------------- runner
+
+def measure(fn, iterations, concurrency):
+    latencies = []
+
+    def timed(i):
+        started = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(timed, range(iterations)))
+    else:
+        for i in range(iterations):
+            timed(i)
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "iterations": iterations,
+        "p50_ms": round(1000 * statistics.median(latencies), 2),
+        "p95_ms": round(1000 * latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+        "mean_ms": round(1000 * statistics.fmean(latencies), 2),
+        "calls_per_sec": round(iterations / wall, 2) if wall else 0.0,
+    }
+
+
+def build_cases(db, patients):
+    import patient_context
+    from diagnosis_agent import diagnose_patient
+    from diet_agent import suggest_diet
+    from faq_generator import generate_faqs
+    from report_analyser import analyze_report_with_llm
+
+    cases = {}
+    for size, name, email in patients:
+        cases[f"login_lookup[{size}]"] = lambda i, n=name, e=email: db.patients_collection.find_one({"name": n, "email": e})
+        cases[f"sidebar_context[{size}]"] = lambda i, e=email: patient_context.load_patient_context(e)
+    size, name, email = patients[0]
+    cases["diagnose_patient"] = lambda i: diagnose_patient(name, email)
+    cases["suggest_diet"] = lambda i: suggest_diet(name, email)
+    summary = "Blood sugar is slightly high. Continue metformin and walk daily. " * 5
+    cases["generate_faqs[miss]"] = lambda i: generate_faqs(f"{summary} Visit {i} {time.time_ns()}.")
+    cases["generate_faqs[hit]"] = lambda i: generate_faqs(summary)
+    for pages in (2, 60):
+        report = synthetic_report(pages)
+        cases[f"analyze_report_with_llm[{pages}p]"] = lambda i, r=report: analyze_report_with_llm(r)
+    try:
+        import ocr
+        if ocr.find_tesseract():
+            image = synthetic_strip_image()
+            cases["tablet_ocr"] = lambda i: ocr.extract_text(image)
+        else:
+            print("tesseract not found; skipping tablet_ocr", file=sys.stderr)
+    except ImportError as e:
+        print(f"OCR dependencies missing ({e}); skipping tablet_ocr", file=sys.stderr)
+    return cases
+
+
+def compare(results, baseline, tolerance):
+    """Return (case, metric, baseline, current) for every case whose p95 regressed past tolerance."""
+    regressions = []
+    for case, current in results.items():
+        before = baseline.get("results", {}).get(case)
+        if before and current["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append((case, "p95_ms", before["p95_ms"], current["p95_ms"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark core functions against a fake LLM and in-memory Mongo.")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=1, help="parallel callers per case")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake LLM time to first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--history-sizes", default="10,200,2000", help="appointments/records per synthetic patient")
+    parser.add_argument("--only", help="regex; run only matching cases")
+    parser.add_argument("--save", help="write results as a baseline JSON file")
+    parser.add_argument("--compare", help="baseline JSON to compare p95 against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 slowdown vs baseline (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    db = install_fakes(args.latency, args.tokens_per_second)
+    patients = seed_patients(db, [int(s) for s in args.history_sizes.split(",")])
+    cases = build_cases(db, patients)
+
+    results = {}
+    print(f"{'case':40} {'p50 ms':>10} {'p95 ms':>10} {'calls/s':>10}")
+    for case, fn in cases.items():
+        if args.only and not re.search(args.only, case):
+            continue
+        results[case] = measure(fn, args.iterations, args.concurrency)
+        r = results[case]
+        print(f"{case:40} {r['p50_ms']:>10} {r['p95_ms']:>10} {r['calls_per_sec']:>10}")
+
+    config = {k: getattr(args, k) for k in ("iterations", "concurrency", "latency", "tokens_per_second", "history_sizes")}
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"created": datetime.now().isoformat(), "config": config, "results": results}, f, indent=2)
+        print(f"Saved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for case, metric, before, now in regressions:
+            print(f"REGRESSION {case}: {metric} {before} -> {now}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+# cache.py
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def content_key(*parts) -> str:
+    """SHA-256 over the given parts, used as a content-addressed cache key."""
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(str(p).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def normalize_text(text: str) -> str:
+    return " ".join((text or "").split()).lower()
+
+
+class TTLCache:
+    """Thread-safe in-process LRU with per-entry expiry and hit/miss counters."""
+
+    def __init__(self, maxsize=256, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            expires, value = item
+            if expires is not None and expires < time.time():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+class DiskStore:
+    """One JSON file per key under `directory`; entries older than `ttl` are treated as missing.
+
+    Expired files are purged when the store is created and again every `purge_every` writes,
+    so keys that are never read again do not pile up on disk.
+    """
+
+    def __init__(self, directory, ttl=7 * 24 * 3600, purge_every=500):
+        self.directory = directory
+        self.ttl = ttl
+        self.purge_every = purge_every
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+        self.purge_expired()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self.ttl and entry.get("created", 0) + self.ttl < time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry.get("value")
+
+    def set(self, key, value):
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"created": time.time(), "value": value}, f)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+        self._writes += 1
+        if self.purge_every and self._writes % self.purge_every == 0:
+            self.purge_expired()
+
+    def purge_expired(self):
+        if not self.ttl:
+            return 0
+        removed = 0
+        cutoff = time.time() - self.ttl
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return 0
+        for fname in names:
+            path = os.path.join(self.directory, fname)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                pass
+        return removed
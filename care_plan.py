@@ -0,0 +1,151 @@
+# care_plan.py
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import streamlit as st
+
+import db
+import diagnosis_agent
+import diet_agent
+import routine_agent
+from diagnosis_agent import diagnose_patient, diagnose_patient_stream
+from diet_agent import suggest_diet, suggest_diet_stream
+from llm import concurrency_limit
+from routine_agent import suggest_routine, suggest_routine_stream
+
+PATIENT_FIELDS = {"_id": 0, "name": 1, "symptoms": 1, "conditions": 1}
+
+# (section, agent, session_state key the output is stored under)
+SECTIONS = [
+    ("Diagnosis", diagnose_patient, "diagnosis_output"),
+    ("Diet", suggest_diet, "diet_output"),
+    ("Routine", suggest_routine, "routine_output"),
+]
+STREAMS = {
+    "Diagnosis": diagnose_patient_stream,
+    "Diet": suggest_diet_stream,
+    "Routine": suggest_routine_stream,
+}
+
+# Each section holds a worker for its whole LLM stream, so size the pool by what the
+# models can serve at once rather than by a fixed number of users.
+CARE_PLAN_WORKERS = sum(
+    concurrency_limit(model) for model in {diagnosis_agent.MODEL, diet_agent.MODEL, routine_agent.MODEL}
+)
+
+_executor = ThreadPoolExecutor(max_workers=CARE_PLAN_WORKERS, thread_name_prefix="care-plan")
+
+
+def iter_care_plan(name: str, email: str):
+    """Yield (section, output) for each agent as soon as it finishes.
+
+    The patient document is loaded once and shared by all three agents, which
+    run concurrently, so the total time is that of the slowest agent.
+    """
+    patient = db.patients_collection.find_one({"name": name, "email": email}, PATIENT_FIELDS)
+    if not patient:
+        for section, _, _ in SECTIONS:
+            yield section, f"❌ No patient found with name '{name}' and email '{email}'."
+        return
+
+    # Set when the consumer stops early, so the agents stop streaming and free their workers.
+    stop = threading.Event()
+    futures = {
+        _executor.submit(_collect, STREAMS[section](name, email, patient), stop): section
+        for section, _, _ in SECTIONS
+    }
+    try:
+        for future in as_completed(futures):
+            section = futures[future]
+            try:
+                yield section, future.result()
+            except Exception as e:
+                yield section, f"⚠️ Could not generate the {section.lower()} section: {e}"
+    finally:
+        stop.set()
+        for future in futures:
+            future.cancel()
+
+
+def _collect(stream, stop):
+    parts = []
+    try:
+        for piece in stream:
+            if stop.is_set():
+                break
+            parts.append(piece)
+    finally:
+        stream.close()
+    return "".join(parts)
+
+
+def _pump(section, stream, out, stop):
+    try:
+        for piece in stream:
+            if stop.is_set():
+                return
+            out.put((section, piece))
+    except Exception as e:
+        out.put((section, f"\n\n⚠️ Could not finish the {section.lower()} section: {e}"))
+    finally:
+        stream.close()
+        out.put((section, None))
+
+
+def iter_care_plan_chunks(name: str, email: str):
+    """Yield (section, text_piece) from all three agents as tokens arrive.
+
+    Pieces from different sections are interleaved; each section ends with a
+    (section, None) marker.
+    """
+    patient = db.patients_collection.find_one({"name": name, "email": email}, PATIENT_FIELDS)
+    if not patient:
+        for section, _, _ in SECTIONS:
+            yield section, f"❌ No patient found with name '{name}' and email '{email}'."
+            yield section, None
+        return
+
+    out = queue.Queue()
+    stop = threading.Event()
+    for section, _, _ in SECTIONS:
+        _executor.submit(_pump, section, STREAMS[section](name, email, patient), out, stop)
+    pending = len(SECTIONS)
+    try:
+        while pending:
+            section, piece = out.get()
+            if piece is None:
+                pending -= 1
+            yield section, piece
+    finally:
+        # A Streamlit rerun closes this generator mid-stream; stop the pumps rather than
+        # letting them hold pool workers and model connections for an orphaned queue.
+        stop.set()
+
+
+def care_plan(name: str, email: str) -> dict:
+    return dict(iter_care_plan(name, email))
+
+
+def render_care_plan(name: str, email: str) -> str:
+    """Render the three sections in a fixed order, streaming tokens into each slot as they arrive."""
+    slots = {}
+    for section, _, _ in SECTIONS:
+        slots[section] = st.empty()
+        slots[section].info(f"⏳ Preparing {section.lower()}...")
+
+    keys = {section: key for section, _, key in SECTIONS}
+    buffers = {section: [] for section, _, _ in SECTIONS}
+    outputs = {}
+    for section, piece in iter_care_plan_chunks(name, email):
+        if piece is None:
+            outputs[section] = "".join(buffers[section])
+            st.session_state[keys[section]] = outputs[section]
+            slots[section].markdown(outputs[section])
+            continue
+        buffers[section].append(piece)
+        slots[section].markdown("".join(buffers[section]) + " ▌")
+
+    combined = "\n\n".join(outputs[section] for section, _, _ in SECTIONS if section in outputs)
+    st.session_state["assistant_output"] = combined
+    return combined
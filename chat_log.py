@@ -0,0 +1,131 @@
+# chat_log.py
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from db import records_collection
+
+BATCH_SIZE = int(os.getenv("CHAT_LOG_BATCH_SIZE", 50))
+FLUSH_INTERVAL = float(os.getenv("CHAT_LOG_FLUSH_SECONDS", 2.0))
+MAX_RETRIES = 5
+MAX_QUEUE = 10000
+DUPLICATE_KEY = 11000
+
+logger = logging.getLogger(__name__)
+
+_queue = queue.Queue(maxsize=MAX_QUEUE)
+_stop = threading.Event()
+_worker = None
+_worker_lock = threading.Lock()
+stats = {"queued": 0, "written": 0, "retries": 0, "dropped": 0}
+
+
+def _insert_with_retry(batch):
+    # insert_many sets each record's _id in place, so a retry of a write that reached the
+    # server fails with duplicate keys; those records count as written and are not retried.
+    delay = 0.5
+    pending = batch
+    for attempt in range(MAX_RETRIES):
+        try:
+            records_collection.insert_many(pending, ordered=False)
+            stats["written"] += len(pending)
+            return True
+        except BulkWriteError as e:
+            failed = {
+                err["index"] for err in e.details.get("writeErrors", [])
+                if err.get("code") != DUPLICATE_KEY
+            }
+            stats["written"] += len(pending) - len(failed)
+            pending = [record for i, record in enumerate(pending) if i in failed]
+            if not pending:
+                return True
+        except PyMongoError:
+            pass
+        if attempt == MAX_RETRIES - 1:
+            break
+        stats["retries"] += 1
+        time.sleep(delay)
+        delay = min(delay * 2, 10)
+    stats["dropped"] += len(pending)
+    logger.warning("chat_log: dropped %d chat records after %d failed writes", len(pending), MAX_RETRIES)
+    return False
+
+
+def _drain(limit):
+    batch = []
+    while len(batch) < limit:
+        try:
+            batch.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+
+def _run():
+    while not _stop.is_set():
+        batch = []
+        deadline = time.monotonic() + FLUSH_INTERVAL
+        # Collect until the batch is full or the flush interval has passed.
+        while len(batch) < BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(_queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+            if _stop.is_set():
+                break
+        if batch:
+            _insert_with_retry(batch)
+
+
+def _ensure_worker():
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name="chat-log-writer", daemon=True)
+            _worker.start()
+
+
+def log_chat(email, question, answer):
+    """Queue a chat record for a batched background insert; never blocks on Mongo."""
+    record = {
+        "email": email,
+        "question": question,
+        "answer": answer,
+        "timestamp": datetime.utcnow(),
+    }
+    _ensure_worker()
+    try:
+        _queue.put_nowait(record)
+        stats["queued"] += 1
+    except queue.Full:
+        stats["dropped"] += 1
+
+
+def flush():
+    """Write everything still queued, synchronously. Called at interpreter shutdown."""
+    while True:
+        batch = _drain(BATCH_SIZE)
+        if not batch:
+            return
+        _insert_with_retry(batch)
+
+
+def shutdown():
+    _stop.set()
+    if _worker is not None:
+        _worker.join(timeout=FLUSH_INTERVAL + 1)
+    flush()
+
+
+atexit.register(shutdown)
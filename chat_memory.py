@@ -0,0 +1,103 @@
+# chat_memory.py
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.prompts import ChatPromptTemplate
+
+from db import records_collection
+from llm import get_chat
+from profiler import profiled
+
+# Turns kept verbatim in the prompt; everything older lives in the rolling summary.
+HISTORY_TURNS = int(os.getenv("CHAT_HISTORY_TURNS", 6))
+# Only re-summarize once this many turns have fallen out of the window, and fold at most
+# SUMMARY_MAX_BATCH of them per update, so each update is one small, bounded LLM call.
+SUMMARY_MIN_BATCH = int(os.getenv("CHAT_SUMMARY_MIN_BATCH", 4))
+SUMMARY_MAX_BATCH = 40
+
+TURN_FIELDS = {"_id": 0, "question": 1, "answer": 1, "timestamp": 1}
+
+summaries_collection = records_collection.database["chat_summaries"]
+SUMMARY_MODEL = "llama-3.1-8b-instant"
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="chat-summary")
+
+summary_prompt = ChatPromptTemplate.from_messages([
+    ("system", "You maintain a short running summary of a patient's conversation with their health assistant. "
+               "Keep facts the assistant may need later: symptoms mentioned, medications, concerns, advice given "
+               "and any follow-ups. Write at most 150 words in plain prose."),
+    ("human", "Current summary:\n{summary}\n\nNew conversation turns:\n{turns}\n\nReturn the updated summary.")
+])
+
+
+def format_turns(turns) -> str:
+    return "\n".join(f"User: {t['question']}\nAssistant: {t['answer']}" for t in turns)
+
+
+@profiled("db:recent_turns")
+def recent_turns(email, n=HISTORY_TURNS):
+    """The last `n` turns in chronological order, read with a sorted, limited, projected query."""
+    cursor = (
+        records_collection.find({"email": email, "question": {"$exists": True}}, TURN_FIELDS)
+        .sort("timestamp", -1)
+        .limit(n)
+    )
+    return list(reversed(list(cursor)))
+
+
+@profiled("db:load_summary")
+def load_summary(email):
+    doc = summaries_collection.find_one({"email": email}, {"_id": 0, "summary": 1, "summarized_until": 1})
+    if not doc:
+        return "", None
+    return doc.get("summary", ""), doc.get("summarized_until")
+
+
+def update_summary(email):
+    """Fold turns that have left the verbatim window into the user's rolling summary."""
+    window = recent_turns(email)
+    if len(window) < HISTORY_TURNS:
+        return
+    summary, summarized_until = load_summary(email)
+
+    ts_filter = {"$lt": window[0]["timestamp"]}
+    if summarized_until is not None:
+        ts_filter["$gt"] = summarized_until
+    overflow = list(
+        records_collection.find({"email": email, "question": {"$exists": True}, "timestamp": ts_filter}, TURN_FIELDS)
+        .sort("timestamp", 1)
+        .limit(SUMMARY_MAX_BATCH)
+    )
+    if len(overflow) < SUMMARY_MIN_BATCH:
+        return
+
+    chain = summary_prompt | get_chat(SUMMARY_MODEL, temperature=0)
+    updated = chain.invoke({
+        "summary": summary or "(none yet)",
+        "turns": format_turns(overflow),
+    }).content.strip()
+    summaries_collection.update_one(
+        {"email": email},
+        {"$set": {"summary": updated, "summarized_until": overflow[-1]["timestamp"]}},
+        upsert=True,
+    )
+
+
+def schedule_summary_update(email):
+    def _run():
+        try:
+            update_summary(email)
+        except Exception:
+            pass
+    _executor.submit(_run)
+
+
+def build_history(email) -> str:
+    """Prompt-ready history: rolling summary of older turns plus the last few verbatim."""
+    summary, _ = load_summary(email)
+    turns = recent_turns(email)
+    parts = []
+    if summary:
+        parts.append(f"Summary of earlier conversations:\n{summary}")
+    if turns:
+        parts.append(f"Recent conversation:\n{format_turns(turns)}")
+    return "\n\n".join(parts)
@@ -0,0 +1,57 @@
+# db_async.py
+"""Motor (asyncio) handles on the collections db.py exposes, for the async agent API.
+
+Database and collection names are taken from db.py's collections so both drivers
+always read the same data. The client is created on first use; MONGO_URI must be
+set (environment or Streamlit secrets).
+"""
+import os
+import threading
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import db
+
+load_dotenv()
+
+_COLLECTIONS = ("patients_collection", "appointments_collection", "records_collection")
+
+_lock = threading.Lock()
+_client = None
+_collections = {}
+
+
+def _setting(name, default=None):
+    value = os.getenv(name)
+    if value:
+        return value
+    try:
+        import streamlit as st
+        return st.secrets[name]
+    except Exception:
+        return default
+
+
+def get_client():
+    """The process-wide motor client; motor attaches it to the running event loop on first use."""
+    global _client
+    with _lock:
+        if _client is None:
+            uri = _setting("MONGO_URI")
+            if not uri:
+                raise RuntimeError("MONGO_URI is not set; the async API needs the same Mongo deployment as db.py.")
+            _client = AsyncIOMotorClient(uri, maxPoolSize=int(os.getenv("MONGO_ASYNC_POOL_SIZE", 100)))
+    return _client
+
+
+def __getattr__(name):
+    # db_async.patients_collection etc. mirror the pymongo collection of the same name in db.py.
+    if name not in _COLLECTIONS:
+        raise AttributeError(f"module 'db_async' has no attribute {name!r}")
+    collection = _collections.get(name)
+    if collection is None:
+        sync = getattr(db, name)
+        collection = get_client()[sync.database.name][sync.name]
+        _collections[name] = collection
+    return collection
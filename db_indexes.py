@@ -0,0 +1,102 @@
+# db_indexes.py
+import argparse
+import sys
+from datetime import datetime
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+from db import patients_collection, appointments_collection, records_collection
+from appointments import START_FIELD
+from chat_memory import summaries_collection
+
+# Not imported from report_cache, which builds an LLM client and loads the PDF/DOCX readers;
+# this CLI only needs Mongo.
+report_cache_collection = patients_collection.database["report_cache"]
+
+# (collection, keys, options)
+INDEXES = [
+    (patients_collection, [("email", ASCENDING)], {"unique": True}),
+    (records_collection, [("email", ASCENDING), ("timestamp", DESCENDING)], {}),
+    (appointments_collection, [("email", ASCENDING), (START_FIELD, ASCENDING)], {}),
+    (summaries_collection, [("email", ASCENDING)], {"unique": True}),
+    (report_cache_collection, [("last_access", ASCENDING)], {}),
+]
+
+SAMPLE_EMAIL = "index-check@example.com"
+
+
+def hot_queries():
+    """(label, cursor) for every lookup the app runs on the request path."""
+    return [
+        ("login: patients by name+email",
+         patients_collection.find({"name": "x", "email": SAMPLE_EMAIL}).limit(1)),
+        ("profile/signup: patients by email",
+         patients_collection.find({"email": SAMPLE_EMAIL}).limit(1)),
+        ("agents: patients by name+email (projected)",
+         patients_collection.find({"name": "x", "email": SAMPLE_EMAIL}, {"_id": 0, "name": 1, "symptoms": 1}).limit(1)),
+        ("chat: recent records",
+         records_collection.find({"email": SAMPLE_EMAIL}).sort("timestamp", -1).limit(6)),
+        ("chat: summary",
+         summaries_collection.find({"email": SAMPLE_EMAIL}).limit(1)),
+        ("appointments: next",
+         appointments_collection.find({"email": SAMPLE_EMAIL, START_FIELD: {"$gt": datetime.now()}}).sort(START_FIELD, 1).limit(1)),
+        ("appointments: page",
+         appointments_collection.find({"email": SAMPLE_EMAIL, START_FIELD: {"$type": "date"}}).sort(START_FIELD, -1).limit(50)),
+    ]
+
+
+def ensure_indexes(verbose=False):
+    """Create every declared index; existing ones are left alone. Returns a list of failures."""
+    failures = []
+    for collection, keys, options in INDEXES:
+        label = f"{collection.name}({', '.join(k for k, _ in keys)})"
+        try:
+            collection.create_index(keys, **options)
+            if verbose:
+                print(f"ok    {label}")
+        except OperationFailure as e:
+            # e.g. duplicate emails prevent the unique index; report and keep going.
+            failures.append((label, str(e)))
+            if verbose:
+                print(f"FAIL  {label}: {e}")
+    return failures
+
+
+def _stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _stages(item)
+
+
+def check_query_plans(verbose=True):
+    """explain() each hot query and return the labels whose winning plan contains a COLLSCAN."""
+    scans = []
+    for label, cursor in hot_queries():
+        winning = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        stages = list(_stages(winning))
+        if "COLLSCAN" in stages:
+            scans.append(label)
+        if verbose:
+            status = "COLLSCAN" if "COLLSCAN" in stages else "ok"
+            print(f"{status:9} {label}: {' <- '.join(stages)}")
+    return scans
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create MongoDB indexes and check hot query plans.")
+    parser.add_argument("--check", action="store_true", help="run explain() on hot queries and report COLLSCANs")
+    args = parser.parse_args(argv)
+
+    failures = ensure_indexes(verbose=True)
+    scans = check_query_plans() if args.check else []
+    return 1 if failures or scans else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,16 @@
-from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
-import os, db
-from dotenv import load_dotenv
-import streamlit as st
-load_dotenv()
+import db
+import db_async
+from llm import get_chat
 
-def diagnose_patient(name: str, email: str) -> str:
-    GROQ_API_KEY = st.secrets["GROQ_API_KEY"]
+MODEL = "openai/gpt-oss-120b"
+PATIENT_FIELDS = {"_id": 0, "name": 1, "symptoms": 1}
+# Async runs call the metrics handler off the caller's stack, so name the agent explicitly.
+RUN_CONFIG = {"metadata": {"agent": "diagnosis_agent"}}
 
-    patient = db.patients_collection.find_one({"name": name, "email": email}, {"_id": 0, "name": 1, "symptoms": 1})
-    if not patient:
-        return "Patient not found."
 
+def _request(name: str, patient: dict):
+    """(header, chain, inputs) shared by the sync and async paths."""
     symptoms = patient.get("symptoms", [])
     system_prompt = (
         "You are a doctor with excellent knowledge about the human body and all diseases with their cures. "
@@ -20,7 +19,43 @@ def diagnose_patient(name: str, email: str) -> str:
     human_prompt = ("Give the diagnosis report based on the symptoms: {topic}. Confine it to the top three possibilities."
                     "Tell it like : Top 3 possible diagnosis")
     prompt = ChatPromptTemplate.from_messages([("system", system_prompt), ("human", human_prompt)])
-    chat = ChatGroq(temperature=0, model_name="openai/gpt-oss-120b", groq_api_key=GROQ_API_KEY)
+    chat = get_chat(MODEL, temperature=0)
     chain = prompt | chat
-    output = "".join(chunk.content for chunk in chain.stream({"topic": symptoms}))
-    return f"### Diagnosis for {name}\n**Symptoms**: {', '.join(symptoms)}\n\n**Report**: {output}"
+    header = f"### Diagnosis for {name}\n**Symptoms**: {', '.join(symptoms)}\n\n**Report**: "
+    return header, chain, {"topic": symptoms}
+
+
+def diagnose_patient_stream(name: str, email: str, patient: dict = None):
+    """Yield the diagnosis markdown piece by piece as the model produces it."""
+    if patient is None:
+        patient = db.patients_collection.find_one({"name": name, "email": email}, PATIENT_FIELDS)
+    if not patient:
+        yield "Patient not found."
+        return
+
+    header, chain, inputs = _request(name, patient)
+    yield header
+    for chunk in chain.stream(inputs, config=RUN_CONFIG):
+        yield chunk.content
+
+
+def diagnose_patient(name: str, email: str, patient: dict = None) -> str:
+    return "".join(diagnose_patient_stream(name, email, patient))
+
+
+async def adiagnose_patient_stream(name: str, email: str, patient: dict = None):
+    """Async version of diagnose_patient_stream (motor lookup, astream)."""
+    if patient is None:
+        patient = await db_async.patients_collection.find_one({"name": name, "email": email}, PATIENT_FIELDS)
+    if not patient:
+        yield "Patient not found."
+        return
+
+    header, chain, inputs = _request(name, patient)
+    yield header
+    async for chunk in chain.astream(inputs, config=RUN_CONFIG):
+        yield chunk.content
+
+
+async def adiagnose_patient(name: str, email: str, patient: dict = None) -> str:
+    return "".join([piece async for piece in adiagnose_patient_stream(name, email, patient)])
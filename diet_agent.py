@@ -1,22 +1,16 @@
 # diet.py
-from dotenv import load_dotenv
-from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
 import db
-import streamlit as st
-load_dotenv()
+import db_async
+from llm import get_chat
 
-def suggest_diet(name: str, email: str) -> str:
-    GROQ_API_KEY = st.secrets["GROQ_API_KEY"]
+MODEL = "openai/gpt-oss-20b"
+PATIENT_FIELDS = {"_id": 0, "name": 1, "symptoms": 1, "conditions": 1}
+RUN_CONFIG = {"metadata": {"agent": "diet_agent"}}
 
-    patient = db.patients_collection.find_one(
-        {"name": name, "email": email},
-        {"_id": 0, "name": 1, "symptoms": 1, "conditions": 1}
-    )
-
-    if not patient:
-        return f"❌ No patient found with name '{name}' and email '{email}'."
 
+def _request(patient: dict):
+    """(header, chain, inputs) shared by the sync and async paths."""
     symptoms = patient.get("symptoms", [])
     conditions = patient.get("conditions", [])
     display_name = patient.get("name", "Unknown")
@@ -62,18 +56,54 @@ Give the diet plan, food list, and at least 3 Veg recipes and 3 Non-Veg recipes.
 """
 
     prompt = ChatPromptTemplate.from_messages([("system", system_prompt), ("human", human_prompt)])
-    chat = ChatGroq(temperature=0, model_name="openai/gpt-oss-20b", groq_api_key=GROQ_API_KEY)
+    chat = get_chat(MODEL, temperature=0)
     chain = prompt | chat
 
-    output = "".join(chunk.content for chunk in chain.stream({
-        "name": display_name,
-        "symptoms": symptoms,
-        "conditions": conditions
-    }))
-
-    return (
+    header = (
         f"### Diet Plan for {display_name}\n"
         f"**Symptoms**: {', '.join(symptoms)}\n"
         f"**Conditions**: {', '.join(conditions)}\n\n"
-        f"**Recommended Diet & Recipes**:\n{output}"
+        f"**Recommended Diet & Recipes**:\n"
     )
+    inputs = {
+        "name": display_name,
+        "symptoms": symptoms,
+        "conditions": conditions,
+    }
+    return header, chain, inputs
+
+
+def suggest_diet_stream(name: str, email: str, patient: dict = None):
+    """Yield the diet plan markdown piece by piece as the model produces it."""
+    if patient is None:
+        patient = db.patients_collection.find_one({"name": name, "email": email}, PATIENT_FIELDS)
+    if not patient:
+        yield f"❌ No patient found with name '{name}' and email '{email}'."
+        return
+
+    header, chain, inputs = _request(patient)
+    yield header
+    for chunk in chain.stream(inputs, config=RUN_CONFIG):
+        yield chunk.content
+
+
+def suggest_diet(name: str, email: str, patient: dict = None) -> str:
+    return "".join(suggest_diet_stream(name, email, patient))
+
+
+async def asuggest_diet_stream(name: str, email: str, patient: dict = None):
+    """Async version of suggest_diet_stream (motor lookup, astream)."""
+    if patient is None:
+        patient = await db_async.patients_collection.find_one({"name": name, "email": email}, PATIENT_FIELDS)
+    if not patient:
+        yield f"❌ No patient found with name '{name}' and email '{email}'."
+        return
+
+    header, chain, inputs = _request(patient)
+    yield header
+    async for chunk in chain.astream(inputs, config=RUN_CONFIG):
+        yield chunk.content
+
+
+async def asuggest_diet(name: str, email: str, patient: dict = None) -> str:
+    return "".join([piece async for piece in asuggest_diet_stream(name, email, patient)])
@@ -1,15 +1,21 @@
 # faq_generator.py
 import os, json
-from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
+from llm import get_chat
+from cache import TTLCache, DiskStore, content_key, normalize_text
+from llm_metrics import register_gauges
 
-groq_api_key = os.getenv("GROQ_API_KEY")
+FAQ_MODEL = "openai/gpt-oss-120b"
+# Bump whenever faq_prompt changes so stale cached FAQs are not served.
+FAQ_PROMPT_VERSION = "1"
+FAQ_CACHE_TTL = int(os.getenv("FAQ_CACHE_TTL", 7 * 24 * 3600))
+FAQ_CACHE_DIR = os.getenv("FAQ_CACHE_DIR", os.path.join(".cache", "faq"))
+RUN_CONFIG = {"metadata": {"agent": "faq_generator"}}
 
-chat = ChatGroq(
-    temperature=0.3,
-    model_name="openai/gpt-oss-120b",
-    groq_api_key=groq_api_key
-)
+chat = get_chat(FAQ_MODEL, temperature=0.3)
+
+faq_memory_cache = TTLCache(maxsize=512, ttl=FAQ_CACHE_TTL)
+faq_disk_cache = DiskStore(FAQ_CACHE_DIR, ttl=FAQ_CACHE_TTL)
 
 faq_prompt = ChatPromptTemplate.from_template("""
 You are a helpful medical FAQ generator for a Health Assistant app.
@@ -29,42 +35,97 @@ Return strictly as JSON:
 ]
 """)
 
-def generate_faqs(content: str):
+def faq_cache_key(content: str) -> str:
+    return content_key(FAQ_MODEL, FAQ_PROMPT_VERSION, normalize_text(content))
+
+
+def faq_cache_stats():
+    return faq_memory_cache.stats()
+
+
+register_gauges("faq_cache", faq_cache_stats)
+
+
+def _parse_faqs(response: str):
+    # Try parsing JSON safely
     try:
-        prompt = faq_prompt.format_messages(content=content)
-        response = chat.invoke(prompt).content.strip()
+        faqs = json.loads(response)
+        if isinstance(faqs, list) and all("question" in f and "answer" in f for f in faqs):
+            return faqs
+    except:
+        pass
 
-        # Try parsing JSON safely
+    # Try extracting JSON substring if model adds text around it
+    start = response.find("[")
+    end = response.rfind("]") + 1
+    if start != -1 and end != -1:
         try:
-            faqs = json.loads(response)
+            faqs = json.loads(response[start:end])
             if isinstance(faqs, list) and all("question" in f and "answer" in f for f in faqs):
                 return faqs
         except:
             pass
+    return None
+
+
+def _cached_faqs(key):
+    faqs = faq_memory_cache.get(key)
+    if faqs is not None:
+        return faqs
+    faqs = faq_disk_cache.get(key)
+    if faqs is not None:
+        faq_memory_cache.set(key, faqs)
+    return faqs
+
+
+def _faqs_from_response(key, content, response):
+    faqs = _parse_faqs(response)
+    if faqs is not None:
+        # Only well-formed model output is cached; fallbacks are retried next time.
+        faq_memory_cache.set(key, faqs)
+        faq_disk_cache.set(key, faqs)
+        return faqs
+
+    # 🚨 Fallback: generate at least 2 contextual FAQs from the input
+    fallback = [
+        {"question": "What should I focus on from this report?",
+         "answer": content.split(".")[0][:120] + "..."},
+        {"question": "Do I need professional consultation?",
+         "answer": "Yes. Always discuss these findings with a qualified healthcare provider."}
+    ]
+    return fallback
 
-        # Try extracting JSON substring if model adds text around it
-        start = response.find("[")
-        end = response.rfind("]") + 1
-        if start != -1 and end != -1:
-            try:
-                faqs = json.loads(response[start:end])
-                if isinstance(faqs, list) and all("question" in f and "answer" in f for f in faqs):
-                    return faqs
-            except:
-                pass
-
-        # 🚨 Fallback: generate at least 2 contextual FAQs from the input
-        fallback = [
-            {"question": "What should I focus on from this report?",
-             "answer": content.split(".")[0][:120] + "..."},
-            {"question": "Do I need professional consultation?",
-             "answer": "Yes. Always discuss these findings with a qualified healthcare provider."}
-        ]
-        return fallback
 
+# Absolute fallback if everything fails
+ERROR_FAQS = [
+    {"question": "Why don’t I see my FAQs?",
+     "answer": "The AI service encountered an issue. Please try again later."}
+]
+
+
+def generate_faqs(content: str):
+    key = faq_cache_key(content)
+    faqs = _cached_faqs(key)
+    if faqs is not None:
+        return faqs
+
+    try:
+        prompt = faq_prompt.format_messages(content=content)
+        response = chat.invoke(prompt, config=RUN_CONFIG).content.strip()
+        return _faqs_from_response(key, content, response)
+    except Exception as e:
+        return ERROR_FAQS
+
+
+async def agenerate_faqs(content: str):
+    key = faq_cache_key(content)
+    faqs = _cached_faqs(key)
+    if faqs is not None:
+        return faqs
+
+    try:
+        prompt = faq_prompt.format_messages(content=content)
+        response = (await chat.ainvoke(prompt, config=RUN_CONFIG)).content.strip()
+        return _faqs_from_response(key, content, response)
     except Exception as e:
-        # Absolute fallback if everything fails
-        return [
-            {"question": "Why don’t I see my FAQs?",
-             "answer": "The AI service encountered an issue. Please try again later."}
-        ]
+        return ERROR_FAQS
@@ -0,0 +1,129 @@
+# llm.py
+import os
+import threading
+
+import httpx
+from dotenv import load_dotenv
+from langchain_groq import ChatGroq
+
+from llm_metrics import LLMMetricsHandler, async_retry_hooks, retry_hooks, start_metrics_server
+
+load_dotenv()
+start_metrics_server()
+
+# Max simultaneous requests per model; enforced by the size of that model's connection pool.
+MODEL_CONCURRENCY = {
+    "openai/gpt-oss-120b": int(os.getenv("GROQ_CONCURRENCY_120B", 8)),
+    "openai/gpt-oss-20b": int(os.getenv("GROQ_CONCURRENCY_20B", 8)),
+    "llama-3.1-8b-instant": int(os.getenv("GROQ_CONCURRENCY_8B", 16)),
+}
+DEFAULT_CONCURRENCY = int(os.getenv("GROQ_CONCURRENCY_DEFAULT", 8))
+KEEPALIVE_EXPIRY = 120
+REQUEST_TIMEOUT = httpx.Timeout(60.0, pool=None)
+
+_lock = threading.Lock()
+_clients = {}        # (model_name, temperature) -> ChatGroq
+_http_clients = {}   # model_name -> httpx.Client
+_async_http_clients = {}  # model_name -> httpx.AsyncClient
+
+
+def _api_key():
+    key = os.getenv("GROQ_API_KEY")
+    if key:
+        return key
+    try:
+        import streamlit as st
+        return st.secrets["GROQ_API_KEY"]
+    except Exception:
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) for budgeting prompts before sending them."""
+    return len(text or "") // 4
+
+
+def concurrency_limit(model_name: str) -> int:
+    return MODEL_CONCURRENCY.get(model_name, DEFAULT_CONCURRENCY)
+
+
+def _limits(model_name):
+    limit = concurrency_limit(model_name)
+    return httpx.Limits(
+        max_connections=limit,
+        max_keepalive_connections=limit,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+
+def _http_client(model_name):
+    client = _http_clients.get(model_name)
+    if client is None:
+        client = httpx.Client(
+            limits=_limits(model_name), timeout=REQUEST_TIMEOUT, event_hooks=retry_hooks(model_name)
+        )
+        _http_clients[model_name] = client
+    return client
+
+
+def _async_http_client(model_name):
+    client = _async_http_clients.get(model_name)
+    if client is None:
+        client = httpx.AsyncClient(
+            limits=_limits(model_name), timeout=REQUEST_TIMEOUT, event_hooks=async_retry_hooks(model_name)
+        )
+        _async_http_clients[model_name] = client
+    return client
+
+
+def get_chat(model_name: str, temperature: float = 0) -> ChatGroq:
+    """Return the process-wide ChatGroq for (model_name, temperature).
+
+    Clients for the same model share one keep-alive connection pool, so the
+    TLS handshake is paid once per connection rather than once per call, and
+    the pool size caps how many requests hit that model at the same time.
+    Every call through the client is recorded by llm_metrics.
+    """
+    key = (model_name, float(temperature))
+    chat = _clients.get(key)
+    if chat is not None:
+        return chat
+    with _lock:
+        chat = _clients.get(key)
+        if chat is None:
+            chat = ChatGroq(
+                temperature=temperature,
+                model_name=model_name,
+                groq_api_key=_api_key(),
+                http_client=_http_client(model_name),
+                http_async_client=_async_http_client(model_name),
+                callbacks=[LLMMetricsHandler(model_name)],
+            )
+            _clients[key] = chat
+    return chat
+
+
+def registry_stats():
+    with _lock:
+        return {
+            "clients": sorted(f"{m}@{t}" for m, t in _clients),
+            "concurrency": {m: concurrency_limit(m) for m in _http_clients},
+        }
+
+
+def close_all():
+    with _lock:
+        for client in _http_clients.values():
+            client.close()
+        _http_clients.clear()
+        _async_http_clients.clear()
+        _clients.clear()
+
+
+async def aclose_all():
+    """close_all() for async servers: also closes the async connection pools."""
+    with _lock:
+        async_clients = list(_async_http_clients.values())
+    for client in async_clients:
+        await client.aclose()
+    close_all()
@@ -0,0 +1,235 @@
+# llm_metrics.py
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+METRICS_PORT = os.getenv("LLM_METRICS_PORT")
+DEBUG_PANEL = os.getenv("LLM_DEBUG_PANEL", "0") == "1"
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+RECENT_SAMPLES = 500
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+_SKIP_MODULES = {"llm", "llm_metrics"}
+
+_lock = threading.Lock()
+_counters = defaultdict(float)                                 # (name, labels) -> value
+_histograms = defaultdict(lambda: [0] * (len(LATENCY_BUCKETS) + 1))  # (name, labels) -> bucket counts
+_hist_sums = defaultdict(float)
+_recent = defaultdict(lambda: deque(maxlen=RECENT_SAMPLES))     # (module, model) -> (latency, ttft)
+_gauge_sources = {}                                           # prefix -> callable returning {name: number}
+_server = None
+
+
+def register_gauges(prefix, fn):
+    """Export the numeric values of fn() (e.g. a cache's stats()) as gauges named <prefix>_<key>."""
+    _gauge_sources[prefix] = fn
+
+
+def _calling_module():
+    # First frame from one of the app's own modules, skipping the LLM plumbing.
+    frame = sys._getframe(2)
+    while frame is not None:
+        path = frame.f_code.co_filename
+        if os.path.dirname(os.path.abspath(path)) == _APP_DIR:
+            module = os.path.splitext(os.path.basename(path))[0]
+            if module not in _SKIP_MODULES:
+                return module
+        frame = frame.f_back
+    return "unknown"
+
+
+def _observe(name, labels, value):
+    index = next((i for i, bound in enumerate(LATENCY_BUCKETS) if value <= bound), len(LATENCY_BUCKETS))
+    _histograms[(name, labels)][index] += 1
+    _hist_sums[(name, labels)] += value
+
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """Records latency, time-to-first-token, token usage and errors per calling module and model.
+
+    Retries happen inside the Groq SDK and are counted by the httpx hooks below instead.
+    """
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self._runs = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        module = (metadata or {}).get("agent") or _calling_module()
+        self._runs[run_id] = {"module": module, "start": time.perf_counter(), "first": None}
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        run = self._runs.get(run_id)
+        if run and run["first"] is None:
+            run["first"] = time.perf_counter()
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        labels = (run["module"] if run else "unknown", self.model_name)
+        with _lock:
+            _counters[("llm_errors_total", labels)] += 1
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        end = time.perf_counter()
+        latency = end - run["start"]
+        ttft = (run["first"] or end) - run["start"]
+        prompt_tokens, completion_tokens = _usage(response)
+        labels = (run["module"], self.model_name)
+        with _lock:
+            _counters[("llm_calls_total", labels)] += 1
+            _counters[("llm_prompt_tokens_total", labels)] += prompt_tokens
+            _counters[("llm_completion_tokens_total", labels)] += completion_tokens
+            _observe("llm_latency_seconds", labels, latency)
+            _observe("llm_ttft_seconds", labels, ttft)
+            _recent[labels].append((latency, ttft))
+
+
+def _record_retry(model_name, request):
+    # The Groq SDK retries at the HTTP layer and numbers each attempt in this header;
+    # LangChain's on_retry callback never sees those retries.
+    try:
+        attempt = int(request.headers.get("x-stainless-retry-count", 0))
+    except ValueError:
+        return
+    if attempt > 0:
+        with _lock:
+            _counters[("llm_retries_total", (_calling_module(), model_name))] += 1
+
+
+def retry_hooks(model_name):
+    """httpx event_hooks for a sync client that count SDK-level retries."""
+    return {"request": [lambda request: _record_retry(model_name, request)]}
+
+
+def async_retry_hooks(model_name):
+    """Same as retry_hooks, for an httpx.AsyncClient."""
+    async def hook(request):
+        _record_retry(model_name, request)
+    return {"request": [hook]}
+
+
+def _usage(response):
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    if usage:
+        return usage.get("prompt_tokens", 0) or 0, usage.get("completion_tokens", 0) or 0
+    # Streaming responses carry usage on the message instead.
+    for generations in response.generations:
+        for gen in generations:
+            meta = getattr(getattr(gen, "message", None), "usage_metadata", None)
+            if meta:
+                return meta.get("input_tokens", 0), meta.get("output_tokens", 0)
+    return 0, 0
+
+
+def _label_str(labels):
+    module, model = labels
+    return f'module="{module}",model="{model}"'
+
+
+def render_prometheus() -> str:
+    lines = []
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: list(v) for k, v in _histograms.items()}
+        sums = dict(_hist_sums)
+    for (name, labels), value in sorted(counters.items()):
+        lines.append(f"{name}{{{_label_str(labels)}}} {value:g}")
+    for (name, labels), buckets in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, buckets):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{_label_str(labels)},le="{bound}"}} {cumulative}')
+        cumulative += buckets[-1]
+        lines.append(f'{name}_bucket{{{_label_str(labels)},le="+Inf"}} {cumulative}')
+        lines.append(f"{name}_sum{{{_label_str(labels)}}} {sums[(name, labels)]:.6f}")
+        lines.append(f"{name}_count{{{_label_str(labels)}}} {cumulative}")
+    for prefix, fn in sorted(_gauge_sources.items()):
+        try:
+            values = fn()
+        except Exception:
+            continue
+        for key, value in sorted(values.items()):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append(f"{prefix}_{key} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+def summary():
+    """Per (module, model) rows for the debug panel."""
+    rows = []
+    with _lock:
+        for labels, samples in sorted(_recent.items()):
+            latencies = sorted(s[0] for s in samples)
+            ttfts = [s[1] for s in samples]
+            rows.append({
+                "module": labels[0],
+                "model": labels[1],
+                "calls": int(_counters[("llm_calls_total", labels)]),
+                "p50_s": round(latencies[len(latencies) // 2], 2),
+                "p95_s": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+                "avg_ttft_s": round(sum(ttfts) / len(ttfts), 2),
+                "prompt_tokens": int(_counters[("llm_prompt_tokens_total", labels)]),
+                "completion_tokens": int(_counters[("llm_completion_tokens_total", labels)]),
+                "retries": int(_counters[("llm_retries_total", labels)]),
+                "errors": int(_counters[("llm_errors_total", labels)]),
+            })
+    return rows
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_metrics_server(port=None):
+    """Serve /metrics on 127.0.0.1:<port> from a daemon thread; only the first call starts it."""
+    global _server
+    port = port or METRICS_PORT
+    if _server is not None or not port:
+        return _server
+    with _lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer(("127.0.0.1", int(port)), _MetricsRequestHandler)
+            except OSError:
+                # Port taken, e.g. by another Streamlit worker on this host.
+                return None
+            threading.Thread(target=_server.serve_forever, name="llm-metrics", daemon=True).start()
+    return _server
+
+
+def render_debug_panel():
+    """In-app view of the same numbers; shown in the sidebar when LLM_DEBUG_PANEL=1."""
+    if not DEBUG_PANEL:
+        return
+    import streamlit as st
+    with st.sidebar.expander("🔧 LLM metrics"):
+        rows = summary()
+        if rows:
+            st.dataframe(rows, hide_index=True)
+        else:
+            st.caption("No LLM calls yet.")
+        for prefix, fn in sorted(_gauge_sources.items()):
+            try:
+                st.caption(f"{prefix}: {fn()}")
+            except Exception:
+                pass
@@ -1,21 +1,53 @@
 # main.py V-6.0
-import os, streamlit as st, pandas as pd, pytesseract
+import os, streamlit as st, pandas as pd
 from dotenv import load_dotenv
 from signup import signup_page
 from login import login_page
 from assistant2 import assistant_page
 from calendar_view import calendar_page
 from tablet_analyser import tablet_analyzer_page
-from motivational_agent import generate_motivational_quote
+from quote_pool import get_daily_quote, warm as warm_quote_pool
 from report import report_analyser_page
 from update import profile_page
 from sidebar_chatbot3 import sidebar_chatbot
 from faq_generator import generate_faqs
+from appointments import backfill_start_at
+from db_indexes import ensure_indexes
+from ocr import warm as warm_ocr_pool
+from llm_metrics import render_debug_panel
+from profiler import section, start_rerun, end_rerun
+from semantic_cache import warm as warm_semantic_cache
 
 chatbot_available = True
 load_dotenv()
-pytesseract.pytesseract.tesseract_cmd = r"C:\\Program Files\\Tesseract-OCR\\tesseract.exe"
+warm_quote_pool()
+warm_semantic_cache()
 st.set_page_config(page_title="AI Health Assistant & Calendar", layout="wide")
+start_rerun()
+
+
+@st.cache_resource
+def bootstrap_db():
+    # Runs once per process: declared indexes, then backfill the native appointment start field.
+    try:
+        ensure_indexes()
+        backfill_start_at()
+    except Exception:
+        pass
+
+
+bootstrap_db()
+
+
+@st.cache_resource
+def start_ocr_workers():
+    try:
+        warm_ocr_pool()
+    except Exception:
+        pass
+
+
+start_ocr_workers()
 
 for key in ["logged_in", "name", "email"]:
     if key not in st.session_state:
@@ -77,7 +109,8 @@ def render_faq_section(content):
     if not text:
         text = collect_context("assistant")
     if text:
-        faqs = generate_faqs(text)
+        with section("generate_faqs"):
+            faqs = generate_faqs(text)
         if faqs and isinstance(faqs, list):
             st.markdown("---")
             st.subheader("❓ Frequently Asked Questions")
@@ -90,66 +123,76 @@ def render_faq_section(content):
                     st.write(a)
 
 
-if st.session_state.logged_in:
-    if chatbot_available:
-        try:
-            sidebar_chatbot()
-        except Exception:
-            st.sidebar.warning("Sidebar chatbot failed to load.")
+PAGES = {
+    "🤖 AI Assistant": (assistant_page, "assistant"),
+    "📅 Calendar": (calendar_page, None),
+    "💊 Tablet Analyzer": (tablet_analyzer_page, "tablet"),
+    "📄 Report Analyzer": (report_analyser_page, "report"),
+    "📝 Edit Profile": (profile_page, "profile"),
+}
+
+
+def run_page(label):
+    page_fn, faq_bucket = PAGES[label]
+    results = st.session_state.setdefault("page_results", {})
+    with section(f"page:{page_fn.__name__}"):
+        res = page_fn()
+    if faq_bucket is None:
+        return
+    ctx = extract_text(res) or results.get(label) or collect_context(faq_bucket)
+    if ctx:
+        results[label] = ctx
+        with section(f"render_faq_section:{faq_bucket}"):
+            render_faq_section(ctx)
+
 
-    with st.container():
-        st.markdown("### 💬 Daily Motivation")
-        with st.spinner("Generating motivational message..."):
+def render_app():
+    if st.session_state.logged_in:
+        if chatbot_available:
             try:
-                st.info(generate_motivational_quote())
+                with section("sidebar_chatbot"):
+                    sidebar_chatbot()
             except Exception:
-                st.warning("Couldn't load quote right now.")
-
-    st.markdown(f"👤 Logged in as: {st.session_state.name}  \n📧 {st.session_state.email}")
-
-    col1, col2 = st.columns([10, 1])
-    with col1:
-        tab1, tab2, tab3, tab4, tab5 = st.tabs(
-            ["🤖 AI Assistant", "📅 Calendar", "💊 Tablet Analyzer", "📄 Report Analyzer", "📝 Edit Profile"]
-        )
-    with col2:
-        if st.button("Logout"):
-            st.session_state.logged_in = False
-            st.session_state.name = None
-            st.session_state.email = None
-            st.rerun()
-
-    with tab1:
-        res = assistant_page()
-        ctx = extract_text(res) or collect_context("assistant")
-        if ctx:
-            render_faq_section(ctx)
+                st.sidebar.warning("Sidebar chatbot failed to load.")
+        render_debug_panel()
 
-    with tab2:
-        calendar_page()
+        with st.container():
+            st.markdown("### 💬 Daily Motivation")
+            try:
+                with section("quote"):
+                    st.info(get_daily_quote(st.session_state.email))
+            except Exception:
+                st.warning("Couldn't load quote right now.")
 
-    with tab3:
-        tabs = tablet_analyzer_page()
-        ctx = extract_text(tabs) or collect_context("tablet")
-        if ctx:
-            render_faq_section(ctx)
+        st.markdown(f"👤 Logged in as: {st.session_state.name}  \n📧 {st.session_state.email}")
 
-    with tab4:
-        reps = report_analyser_page()
-        ctx = extract_text(reps) or collect_context("report")
-        if ctx:
-            render_faq_section(ctx)
+        col1, col2 = st.columns([10, 1])
+        with col1:
+            # Only the selected page runs; st.tabs would execute every tab body on each rerun.
+            active = st.radio(
+                "Page", list(PAGES), horizontal=True, key="active_page", label_visibility="collapsed"
+            )
+        with col2:
+            if st.button("Logout"):
+                st.session_state.logged_in = False
+                st.session_state.name = None
+                st.session_state.email = None
+                st.session_state.pop("page_results", None)
+                st.rerun()
 
-    with tab5:
-        prof = profile_page()
-        ctx = extract_text(prof) or collect_context("profile")
-        if ctx:
-            render_faq_section(ctx)
+        run_page(active)
 
-else:
-    st.title("Welcome to AI Health Assistant")
-    page = st.radio("Select an option:", ["Login", "Sign Up"], horizontal=True)
-    if page == "Login":
-        login_page()
     else:
-        signup_page()
+        st.title("Welcome to AI Health Assistant")
+        page = st.radio("Select an option:", ["Login", "Sign Up"], horizontal=True)
+        if page == "Login":
+            login_page()
+        else:
+            signup_page()
+
+
+# st.rerun() (login, logout) and errors leave through here too; record those reruns as well.
+try:
+    render_app()
+finally:
+    end_rerun()
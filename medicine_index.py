@@ -0,0 +1,180 @@
+# medicine_index.py
+import json
+import os
+import re
+import threading
+import time
+
+from llm_metrics import register_gauges
+
+INDEX_PATH = os.getenv("MEDICINE_INDEX_PATH", os.path.join(".cache", "medicine_index.json"))
+# Curated generic name -> brand/composition aliases; extend it to recognize more strips.
+NAMES_PATH = os.getenv("MEDICINE_NAMES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "medicine_names.json"))
+# Trigram Dice similarity between an alias and a window of OCR tokens for the alias to count as present.
+NAME_THRESHOLD = 0.8
+# Aliases shorter than this must match an OCR token exactly ("pan", "dolo", ...).
+MIN_FUZZY_ALIAS = 5
+STRENGTH_RE = re.compile(r"(\d+(?:\.\d+)?)\s*(mg|mcg|iu)\b")
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", (text or "").lower()).split())
+
+
+def trigrams(text: str) -> set:
+    padded = f"  {normalize(text)} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _dice(a: set, b: set) -> float:
+    return 2 * len(a & b) / (len(a) + len(b)) if a and b else 0.0
+
+
+def strengths(text: str) -> list:
+    """Normalized dose strengths in the text, e.g. ["500mg"]."""
+    found = {f"{float(n):g}{unit}" for n, unit in STRENGTH_RE.findall((text or "").lower())}
+    return sorted(found)
+
+
+class MedicineIndex:
+    """Medicine descriptions keyed by what the strip says the drug is, backed by a JSON file.
+
+    OCR text is reduced to the generic names found in it (via the curated alias
+    dictionary) plus the dose strengths; only an exact match on that key is
+    served. Strip boilerplate ("Each tablet contains... Store below 30C") never
+    counts, and text with no recognized drug name, or with a dose strength that does
+    not follow one, is never matched or indexed.
+    """
+
+    def __init__(self, path=INDEX_PATH, names_path=NAMES_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._aliases = {}    # token count -> list of (alias, trigrams, generic)
+        self._entries = {}    # key -> entry
+        self.hits = 0
+        self.misses = 0
+        self.unrecognized = 0
+        self._load_names(names_path)
+        self._load()
+
+    def _load_names(self, names_path):
+        try:
+            with open(names_path, "r", encoding="utf-8") as f:
+                names = json.load(f)
+        except (OSError, ValueError):
+            names = {}
+        for generic, aliases in names.items():
+            for alias in {generic, *aliases}:
+                alias = normalize(alias)
+                if alias:
+                    self._aliases.setdefault(len(alias.split()), []).append((alias, trigrams(alias), generic))
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = []
+        for entry in entries:
+            self._entries[entry["key"]] = entry
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(list(self._entries.values()), f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+
+    def identify(self, text: str, names=()):
+        """Return (key, generic names, score) for the drugs named in `text`, or (None, [], 0.0).
+
+        `score` is the weakest of the name matches. `names` adds generic names the caller already knows.
+        Every dose strength must follow a recognized name (after the previous strength); otherwise the
+        text names an ingredient the dictionary lacks ("Amoxycillin 250 mg Dicloxacillin 250 mg") and
+        no key is returned, so it goes to the LLM instead of matching the single-drug entry.
+        """
+        lowered = (text or "").lower()
+        # Same tokens as normalize(), with their offsets so names can be lined up with strengths.
+        matches = list(TOKEN_RE.finditer(lowered))
+        tokens = [m.group() for m in matches]
+        found = {normalize(n): 1.0 for n in names if normalize(n)}
+        positions = []
+        for size, aliases in self._aliases.items():
+            for i in range(len(tokens) - size + 1):
+                window = " ".join(tokens[i:i + size])
+                grams = trigrams(window)
+                best, best_score = None, 0.0
+                for alias, alias_grams, generic in aliases:
+                    if len(alias) < MIN_FUZZY_ALIAS:
+                        score = 1.0 if window == alias else 0.0
+                    else:
+                        score = _dice(alias_grams, grams)
+                    if score > best_score:
+                        best, best_score = generic, score
+                # Each window counts for its closest alias only, so "levocetirizine" is not also "cetirizine".
+                if best is not None and best_score >= NAME_THRESHOLD:
+                    found[best] = max(found.get(best, 0.0), best_score)
+                    positions.append(matches[i].start())
+        if not found:
+            return None, [], 0.0
+        previous_end = 0
+        for strength in STRENGTH_RE.finditer(lowered):
+            if not any(previous_end <= pos < strength.start() for pos in positions):
+                return None, [], 0.0
+            previous_end = strength.end()
+        generic_names = sorted(found)
+        key = "+".join(generic_names) + "|" + ",".join(strengths(text))
+        return key, generic_names, round(min(found.values()), 3)
+
+    def lookup(self, text: str):
+        """Return (entry, score) when a description for the same drug(s) and strength is known, or None."""
+        key, _, score = self.identify(text)
+        with self._lock:
+            entry = self._entries.get(key) if key else None
+            if entry is None:
+                self.misses += 1
+                if key is None:
+                    self.unrecognized += 1
+                return None
+            self.hits += 1
+            entry["hits"] = entry.get("hits", 0) + 1
+            return entry, score
+
+    def add(self, text: str, description: str, names=()):
+        """Record a generated description under the drug key of `text`, then persist.
+
+        Texts with no recognized drug name are not indexed; they always go to the LLM.
+        """
+        key, generic_names, _ = self.identify(text, names)
+        if key is None or not description:
+            return
+        with self._lock:
+            self._entries[key] = {
+                "key": key,
+                "names": generic_names,
+                "strengths": strengths(text),
+                "texts": [normalize(text)],
+                "description": description,
+                "created": time.time(),
+                "hits": 0,
+            }
+            try:
+                self._save()
+            except OSError:
+                pass
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "aliases": sum(len(a) for a in self._aliases.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "unrecognized": self.unrecognized,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+medicine_index = MedicineIndex()
+register_gauges("medicine_index", medicine_index.stats)
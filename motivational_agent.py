@@ -1,62 +1,87 @@
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_groq import ChatGroq
-import os
-from dotenv import load_dotenv
+from llm import get_chat
 import random
+import re
 
-load_dotenv()
-GROQ_API_KEY = os.environ.get('GROQ_API_KEY')
+chat = get_chat("llama-3.1-8b-instant", temperature=0.8)
+RUN_CONFIG = {"metadata": {"agent": "motivational_agent"}}
+ATTRIBUTION_RE = re.compile(r"^(?:[—–~]|--)")
 
-chat = ChatGroq(
-    temperature=0.8,
-    model_name="llama-3.1-8b-instant",
-    groq_api_key=GROQ_API_KEY
+SYSTEM_PROMPT = (
+    "You are a compassionate assistant who provides short, uplifting, and unique motivational quotes "
+    "to inspire people on their health journey. Always generate a fresh quote and avoid repeating previous ones. "
+    "Be original and emotionally resonant."
 )
 
+user_prompts = [
+    "What's a fresh motivational message for someone working on their physical health?",
+    "Give a unique inspiring quote for a patient recovering from illness.",
+    "Share a new quote that encourages mental wellness and balance.",
+    "Offer a fresh, hopeful quote for someone starting a healthier lifestyle.",
+    "Inspire someone with a non-cliché quote about health or strength.",
+]
+
+
+def topic_prompt(topic: str) -> str:
+    return f"Provide a new motivational quote related to {topic} that hasn't been used before."
+
+
+def quote_chain(human: str):
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", SYSTEM_PROMPT),
+        ("human", human)
+    ])
+    return prompt | chat
+
+
+def _quote_request(topic: str = None):
+    human = topic_prompt(topic) if topic else random.choice(user_prompts)
+    inputs = {"topic": topic} if topic else {}
+    return quote_chain(human), inputs
+
+
 def generate_motivational_quote(topic: str = None, stream: bool = False):
-    system_prompt = (
-        "You are a compassionate assistant who provides short, uplifting, and unique motivational quotes "
-        "to inspire people on their health journey. Always generate a fresh quote and avoid repeating previous ones. "
-        "Be original and emotionally resonant."
-    )
-
-    user_prompts = [
-        "What's a fresh motivational message for someone working on their physical health?",
-        "Give a unique inspiring quote for a patient recovering from illness.",
-        "Share a new quote that encourages mental wellness and balance.",
-        "Offer a fresh, hopeful quote for someone starting a healthier lifestyle.",
-        "Inspire someone with a non-cliché quote about health or strength.",
-    ]
-
-    if topic:
-        human = f"Provide a new motivational quote related to {topic} that hasn't been used before."
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", system_prompt),
-            ("human", human)
-        ])
-        chain = prompt | chat
-
-        if stream:
-            for chunk in chain.stream({"topic": topic}):
-                print(chunk.content, end="", flush=True)
-        else:
-            response = chain.invoke({"topic": topic})
-            return response.content
+    chain, inputs = _quote_request(topic)
 
+    if stream:
+        for chunk in chain.stream(inputs, config=RUN_CONFIG):
+            print(chunk.content, end="", flush=True)
     else:
-        human = random.choice(user_prompts)
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", system_prompt),
-            ("human", human)
-        ])
-        chain = prompt | chat
-
-        if stream:
-            for chunk in chain.stream({}):
-                print(chunk.content, end="", flush=True)
-        else:
-            response = chain.invoke({})
-            return response.content
+        response = chain.invoke(inputs, config=RUN_CONFIG)
+        return response.content
+
+
+async def agenerate_motivational_quote(topic: str = None):
+    chain, inputs = _quote_request(topic)
+    response = await chain.ainvoke(inputs, config=RUN_CONFIG)
+    return response.content
+
+
+async def astream_motivational_quote(topic: str = None):
+    chain, inputs = _quote_request(topic)
+    async for chunk in chain.astream(inputs, config=RUN_CONFIG):
+        yield chunk.content
+
+
+def _split_quotes(text: str):
+    # One quote per line; drop any numbering or bullets the model adds anyway, and skip
+    # preambles ("Here are 5 quotes:") and attribution-only lines ("— Unknown").
+    quotes = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.endswith(":") or ATTRIBUTION_RE.match(line):
+            continue
+        line = re.sub(r"^(?:\d+[.)]|[-*•])\s*", "", line).strip()
+        if line:
+            quotes.append(line)
+    return quotes
+
+
+def generate_quote_batch(human: str, n: int = 5):
+    """Generate up to `n` quotes for one prompt in a single LLM request."""
+    chain = quote_chain(f"{human} Give {n} different quotes, one per line, with no numbering or other text.")
+    response = chain.invoke({}, config=RUN_CONFIG)
+    return _split_quotes(response.content)[:n]
 
 if __name__ == "__main__":
     print(generate_motivational_quote())
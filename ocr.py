@@ -0,0 +1,223 @@
+# ocr.py
+import multiprocessing
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+import pytesseract
+from PIL import Image
+
+try:
+    # API-level bindings: one TessBaseAPI per worker, no subprocess or temp files per image.
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+# Phone photos are downscaled so their longer side is at most this many pixels (~300 DPI for a tablet strip).
+TARGET_LONG_SIDE = int(os.getenv("OCR_TARGET_LONG_SIDE", 1600))
+MIN_REGION_AREA = 400
+MAX_REGIONS = 24
+REGION_PADDING = 8
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", max(1, min(4, (os.cpu_count() or 2) - 1))))
+TESSERACT_CONFIG = "--oem 1 --psm 6"   # whole image as one block, when no text lines were found
+# pytesseract runs one tesseract process per call, so it reads the whole binarized strip once
+# in sparse-text mode and keeps only the words inside the detected lines.
+SPARSE_CONFIG = "--oem 1 --psm 11"
+ENGINE = "tesserocr" if tesserocr is not None else "pytesseract"
+
+_WINDOWS_PATHS = [
+    r"C:\Program Files\Tesseract-OCR\tesseract.exe",
+    r"C:\Program Files (x86)\Tesseract-OCR\tesseract.exe",
+]
+_UNIX_PATHS = ["/usr/bin/tesseract", "/usr/local/bin/tesseract", "/opt/homebrew/bin/tesseract"]
+
+# Pools are started from the threaded app process, so workers are spawned rather than forked.
+_pool = None
+_pool_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {"images": 0, "regions": 0, "seconds": 0.0}
+_api = None  # per-worker tesserocr.PyTessBaseAPI
+
+
+def find_tesseract():
+    """Locate the tesseract binary: $TESSERACT_CMD, then PATH, then the usual install locations."""
+    candidates = [os.getenv("TESSERACT_CMD"), shutil.which("tesseract")]
+    candidates += _WINDOWS_PATHS if sys.platform.startswith("win") else _UNIX_PATHS
+    for path in candidates:
+        if path and os.path.isfile(path):
+            return path
+    return None
+
+
+def configure():
+    cmd = find_tesseract()
+    if cmd:
+        pytesseract.pytesseract.tesseract_cmd = cmd
+    return cmd
+
+
+configure()
+
+
+def init_worker():
+    global _api
+    configure()
+    if tesserocr is not None:
+        options = {"psm": tesserocr.PSM.SINGLE_BLOCK, "oem": tesserocr.OEM.LSTM_ONLY}
+        if os.getenv("TESSDATA_PREFIX"):
+            options["path"] = os.getenv("TESSDATA_PREFIX")
+        _api = tesserocr.PyTessBaseAPI(**options)
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=OCR_WORKERS, initializer=init_worker, mp_context=multiprocessing.get_context("spawn")
+            )
+    return _pool
+
+
+def _ping():
+    return os.getpid()
+
+
+def warm():
+    """Start every worker now so the first scan does not pay for process and engine start-up."""
+    if tesserocr is None:
+        # pytesseract starts its own tesseract process per image; there is no pool to warm.
+        return
+    pool = _get_pool()
+    for f in [pool.submit(_ping) for _ in range(OCR_WORKERS)]:
+        f.result()
+
+
+def ocr_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["engine"] = ENGINE
+    stats["workers"] = OCR_WORKERS
+    stats["images_per_second"] = round(stats["images"] / stats["seconds"], 2) if stats["seconds"] else 0.0
+    return stats
+
+
+def preprocess(image):
+    """PIL image -> downscaled grayscale image and its adaptive binarization (text black on white)."""
+    gray = cv2.cvtColor(np.asarray(image.convert("RGB")), cv2.COLOR_RGB2GRAY)
+    h, w = gray.shape
+    scale = TARGET_LONG_SIDE / max(h, w)
+    if scale < 1:
+        gray = cv2.resize(gray, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    gray = cv2.GaussianBlur(gray, (3, 3), 0)
+    binary = cv2.adaptiveThreshold(
+        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 15
+    )
+    return gray, binary
+
+
+def find_text_regions(binary):
+    """Bounding boxes (x, y, w, h) of likely text lines, in reading order."""
+    inverted = cv2.bitwise_not(binary)
+    h, w = binary.shape
+    # Wide, short kernel joins characters of a line into one blob.
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(15, w // 60), max(3, h // 200)))
+    dilated = cv2.dilate(inverted, kernel, iterations=1)
+    contours, _ = cv2.findContours(dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    boxes = []
+    for c in contours:
+        x, y, bw, bh = cv2.boundingRect(c)
+        if bw * bh < MIN_REGION_AREA or bh < 8 or bw < bh:
+            continue
+        # Blobs covering most of the image are background, not text.
+        if bw * bh > 0.6 * w * h:
+            continue
+        boxes.append((x, y, bw, bh))
+    boxes.sort(key=lambda b: b[2] * b[3], reverse=True)
+    boxes = boxes[:MAX_REGIONS]
+    boxes.sort(key=lambda b: (b[1] // 20, b[0]))
+    return boxes
+
+
+def crop_regions(binary, boxes):
+    h, w = binary.shape
+    crops = []
+    for x, y, bw, bh in boxes:
+        x0, y0 = max(0, x - REGION_PADDING), max(0, y - REGION_PADDING)
+        x1, y1 = min(w, x + bw + REGION_PADDING), min(h, y + bh + REGION_PADDING)
+        crops.append(binary[y0:y1, x0:x1])
+    return crops
+
+
+def _ocr_array(array, single_line=True):
+    # tesserocr only; runs inside a pool worker with crops arriving in memory as numpy arrays.
+    # Crops are single text lines, so they are read as one line rather than as a block.
+    _api.SetPageSegMode(tesserocr.PSM.SINGLE_LINE if single_line else tesserocr.PSM.SINGLE_BLOCK)
+    _api.SetImage(Image.fromarray(array))
+    return _api.GetUTF8Text().strip()
+
+
+def _ocr_boxes(binary, boxes):
+    """pytesseract: one tesseract run over the binarized image, words grouped by detected line."""
+    if not boxes:
+        return [pytesseract.image_to_string(binary, config=TESSERACT_CONFIG).strip()]
+    data = pytesseract.image_to_data(binary, config=SPARSE_CONFIG, output_type=pytesseract.Output.DICT)
+    lines = [[] for _ in boxes]
+    for i, word in enumerate(data["text"]):
+        word = word.strip()
+        if not word:
+            continue
+        cx = data["left"][i] + data["width"][i] / 2
+        cy = data["top"][i] + data["height"][i] / 2
+        for n, (x, y, bw, bh) in enumerate(boxes):
+            if x - REGION_PADDING <= cx <= x + bw + REGION_PADDING and y - REGION_PADDING <= cy <= y + bh + REGION_PADDING:
+                lines[n].append(word)
+                break
+    return [" ".join(words) for words in lines]
+
+
+def _regions(image):
+    _, binary = preprocess(image)
+    return binary, find_text_regions(binary)
+
+
+def _join(texts):
+    return " ".join(t.replace("\n", " ") for t in texts if t)
+
+
+def extract_text_inline(image) -> str:
+    """Same pipeline as extract_text, but OCR runs in the calling process.
+
+    For code that is already running inside its own worker process (e.g. the
+    batch analyzer); call init_worker() once in that process first.
+    """
+    binary, boxes = _regions(image)
+    if _api is None:
+        return _join(_ocr_boxes(binary, boxes))
+    if not boxes:
+        return _join([_ocr_array(binary, single_line=False)])
+    return _join(_ocr_array(c) for c in crop_regions(binary, boxes))
+
+
+def extract_text(image) -> str:
+    """OCR a tablet-strip photo: preprocess, detect text lines, OCR them (in parallel with tesserocr)."""
+    started = time.perf_counter()
+    binary, boxes = _regions(image)
+    if tesserocr is None:
+        texts = _ocr_boxes(binary, boxes)
+    elif boxes:
+        # Always go through the warm pool: a TessBaseAPI is not safe to share between threads.
+        texts = list(_get_pool().map(_ocr_array, crop_regions(binary, boxes)))
+    else:
+        texts = [_get_pool().submit(_ocr_array, binary, False).result()]
+    with _stats_lock:
+        _stats["images"] += 1
+        _stats["regions"] += len(boxes) or 1
+        _stats["seconds"] += time.perf_counter() - started
+    return _join(texts)
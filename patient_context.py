@@ -0,0 +1,139 @@
+# patient_context.py
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import streamlit as st
+
+from appointments import (
+    START_FIELD, forget_backfill, upcoming_appointments, recent_appointments, describe_next_appointment, format_appointment_summary
+)
+from db import patients_collection
+from llm import estimate_tokens
+from profiler import profiled
+
+# Safety net for writes made by other processes, which cannot bump the local version.
+CONTEXT_TTL = int(os.getenv("PATIENT_CONTEXT_TTL", 300))
+# Appointment window put in the prompt: recent past plus the next few upcoming ones.
+PAST_DAYS = int(os.getenv("CONTEXT_PAST_DAYS", 90))
+PAST_LIMIT = 10
+UPCOMING_LIMIT = 10
+
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+def context_version(email) -> int:
+    return _versions.get(email, 0)
+
+
+def invalidate_patient_context(email):
+    """Call after writing to a patient's profile or appointments."""
+    with _versions_lock:
+        _versions[email] = _versions.get(email, 0) + 1
+    forget_backfill(email)
+
+
+def _next_in(appointments, now):
+    for a in appointments:
+        if a[START_FIELD] > now:
+            return a
+    return None
+
+
+def _canonical(value):
+    """Stable text for a profile field: whitespace collapsed, lists de-duplicated and sorted."""
+    if not value:
+        return "Not specified"
+    if isinstance(value, (list, tuple, set)):
+        unique = {}
+        for item in value:
+            text = " ".join(str(item).split())
+            if text:
+                unique.setdefault(text.lower(), text)
+        return ", ".join(sorted(unique.values(), key=str.lower)) or "Not specified"
+    return " ".join(str(value).split())
+
+
+def _dedupe_appointments(appointments):
+    seen, unique = set(), []
+    for a in appointments:
+        key = (" ".join(str(a.get("title", "")).lower().split()), a[START_FIELD])
+        if key not in seen:
+            seen.add(key)
+            unique.append(a)
+    return unique
+
+
+def render_context(patient, appointments, next_apt):
+    """Patient record for the prompt, in a fixed field order so identical records give identical text.
+
+    A byte-stable prefix lets the provider's prompt cache hit on follow-up questions.
+    """
+    context = "\n".join([
+        f"Patient Name: {_canonical(patient.get('name') or 'there')}",
+        f"Email: {patient.get('email')}",
+        f"Age: {patient.get('age', 'Not specified')}",
+        f"Gender: {_canonical(patient.get('gender'))}",
+        f"Symptoms: {_canonical(patient.get('symptoms'))}",
+        f"Conditions: {_canonical(patient.get('conditions'))}",
+        f"Medications: {_canonical(patient.get('medications'))}",
+        "",
+        f"Appointments (last {PAST_DAYS} days and upcoming):",
+        format_appointment_summary(appointments),
+        "",
+        "Upcoming Appointment Info:",
+        describe_next_appointment(next_apt),
+    ])
+    return context, (next_apt[START_FIELD] if next_apt else None)
+
+
+@profiled("db:patient_context")
+def load_patient_context(email):
+    """Fresh context entry straight from the database (no session cache), or None."""
+    patient = patients_collection.find_one({"email": email})
+    if not patient:
+        return None
+    now = datetime.now()
+    upcoming = upcoming_appointments(email, now, limit=UPCOMING_LIMIT)
+    past = recent_appointments(email, now - timedelta(days=PAST_DAYS), now, limit=PAST_LIMIT)
+    appointments = _dedupe_appointments(past + upcoming)
+    next_apt = upcoming[0] if upcoming else None
+    context, next_start = render_context(patient, appointments, next_apt)
+    return {
+        "version": context_version(email),
+        "loaded_at": time.time(),
+        "patient": patient,
+        "appointments": appointments,
+        "context": context,
+        "context_tokens": estimate_tokens(context),
+        "next_start": next_start,
+    }
+
+
+def get_patient_context(email):
+    """Cached patient doc, parsed appointments and rendered context for this session.
+
+    Reruns reuse the cached entry without touching the database until the
+    email's version is bumped by invalidate_patient_context or CONTEXT_TTL passes.
+    """
+    cache = st.session_state.setdefault("patient_context_cache", {})
+    entry = cache.get(email)
+    if (
+        entry is None
+        or entry["version"] != context_version(email)
+        or time.time() - entry["loaded_at"] > CONTEXT_TTL
+    ):
+        entry = load_patient_context(email)
+        if entry is None:
+            cache.pop(email, None)
+            return None
+        cache[email] = entry
+    elif entry["next_start"] is not None and entry["next_start"] <= datetime.now():
+        # The upcoming appointment has passed; re-render from cached data only.
+        appointments = entry["appointments"]
+        next_apt = _next_in(appointments, datetime.now())
+        entry["context"], entry["next_start"] = render_context(entry["patient"], appointments, next_apt)
+        entry["context_tokens"] = estimate_tokens(entry["context"])
+    return entry
@@ -0,0 +1,8 @@
+# pdf_worker.py
+# Runs in spawned report-extraction workers, so it imports only PyMuPDF and not the app.
+import fitz  # PyMuPDF for PDF
+
+
+def extract_pdf_range(path, start, end):
+    with fitz.open(path) as doc:
+        return [doc[i].get_text() for i in range(start, end)]
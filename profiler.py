@@ -0,0 +1,110 @@
+# profiler.py
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+ENABLED = os.getenv("PROFILE_RERUNS", "0") == "1"
+TRACE_DIR = os.getenv("PROFILE_TRACE_DIR")
+HISTORY_SIZE = int(os.getenv("PROFILE_HISTORY", 50))
+
+# The trace for the rerun running on this thread; worker threads have none and record nothing.
+_local = threading.local()
+
+
+def _trace():
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def section(name):
+    """Time a named block of the current rerun. Nested sections form a tree."""
+    trace = _trace()
+    if trace is None:
+        yield
+        return
+    stack = trace["stack"]
+    span = {"name": name, "depth": len(stack), "start": time.perf_counter() - trace["t0"]}
+    trace["spans"].append(span)
+    stack.append(span)
+    try:
+        yield
+    finally:
+        stack.pop()
+        span["duration"] = time.perf_counter() - trace["t0"] - span["start"]
+
+
+def profiled(name):
+    """Decorator form of section(), for functions such as database lookups."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with section(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_rerun(label="rerun"):
+    if not ENABLED:
+        return
+    _local.trace = {"label": label, "wall": time.time(), "t0": time.perf_counter(), "spans": [], "stack": []}
+
+
+def _flame_lines(trace):
+    total = trace["total"] or 1e-9
+    lines = [f"{trace['label']}: {trace['total'] * 1000:.0f} ms"]
+    for span in trace["spans"]:
+        duration = span.get("duration", 0.0)
+        bar = "█" * max(1, int(30 * duration / total))
+        lines.append(f"{'  ' * (span['depth'] + 1)}{span['name']:<32} {duration * 1000:8.1f} ms {bar}")
+    return lines
+
+
+def _chrome_trace(trace):
+    # Chrome/Perfetto trace events; open the file in chrome://tracing or ui.perfetto.dev.
+    return {"traceEvents": [
+        {"name": s["name"], "ph": "X", "pid": 1, "tid": 1,
+         "ts": int(s["start"] * 1e6), "dur": int(s.get("duration", 0.0) * 1e6)}
+        for s in trace["spans"]
+    ]}
+
+
+def end_rerun():
+    """Close the trace, keep it in this session's history, optionally dump it, and show the summary."""
+    trace = _trace()
+    if trace is None:
+        return
+    _local.trace = None
+    trace["total"] = time.perf_counter() - trace["t0"]
+    del trace["stack"]
+
+    import streamlit as st
+    history = st.session_state.setdefault("_profiler_history", deque(maxlen=HISTORY_SIZE))
+    history.append(trace)
+
+    if TRACE_DIR:
+        try:
+            os.makedirs(TRACE_DIR, exist_ok=True)
+            path = os.path.join(TRACE_DIR, f"rerun-{int(trace['wall'] * 1000)}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(_chrome_trace(trace), f)
+        except OSError:
+            pass
+
+    with st.sidebar.expander("⏱️ Rerun profile"):
+        st.code("\n".join(_flame_lines(trace)), language="text")
+        totals = [t["total"] for t in history]
+        st.caption(
+            f"Last {len(totals)} reruns: avg {1000 * sum(totals) / len(totals):.0f} ms, "
+            f"max {1000 * max(totals):.0f} ms"
+        )
+        st.download_button(
+            "Download history (JSON)",
+            json.dumps(list(history), default=str),
+            file_name="rerun_profile.json",
+            mime="application/json",
+        )
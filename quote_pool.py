@@ -0,0 +1,123 @@
+# quote_pool.py
+import hashlib
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from motivational_agent import user_prompts, topic_prompt, generate_quote_batch
+
+BATCH_SIZE = int(os.getenv("QUOTE_BATCH_SIZE", 5))
+LOW_WATERMARK = int(os.getenv("QUOTE_LOW_WATERMARK", 2))
+MAX_SERVED_CACHE = 10000
+MAX_SEEN = 5000
+
+FALLBACK_QUOTES = [
+    "Every small step you take today is a gift to your health tomorrow.",
+    "Healing is not a straight line. Be patient and kind to yourself.",
+    "Your body hears everything your mind says. Speak to it with hope.",
+]
+
+_lock = threading.Lock()
+_pools = {}          # prompt -> deque of unserved quotes
+_seen = OrderedDict()  # normalized recently pooled quotes, for de-duplication (oldest first)
+_served = {}         # (user, day) -> quote
+_refilling = set()   # prompts with a refill in flight
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="quote-refill")
+
+
+def _normalize(quote: str) -> str:
+    return " ".join(quote.lower().strip(" \"'“”").split())
+
+
+def _add_quotes(prompt, quotes):
+    added = 0
+    with _lock:
+        pool = _pools.setdefault(prompt, deque())
+        for q in quotes:
+            q = q.strip().strip('"“”').strip()
+            key = _normalize(q)
+            if not q or key in _seen:
+                continue
+            _seen[key] = None
+            if len(_seen) > MAX_SEEN:
+                _seen.popitem(last=False)
+            pool.append(q)
+            added += 1
+    return added
+
+
+def _refill(prompt):
+    try:
+        _add_quotes(prompt, generate_quote_batch(prompt, BATCH_SIZE))
+    except Exception:
+        pass
+    finally:
+        with _lock:
+            _refilling.discard(prompt)
+
+
+def request_refill(prompt):
+    with _lock:
+        if prompt in _refilling or len(_pools.get(prompt, ())) > LOW_WATERMARK:
+            return
+        _refilling.add(prompt)
+    _executor.submit(_refill, prompt)
+
+
+def warm(topics=()):
+    """Schedule background generation for every built-in prompt and the given topics."""
+    for prompt in list(user_prompts) + [topic_prompt(t) for t in topics]:
+        request_refill(prompt)
+
+
+def _pick_prompt(user, day, topic):
+    if topic:
+        return topic_prompt(topic)
+    digest = hashlib.sha256(f"{user}|{day}".encode("utf-8")).digest()
+    return user_prompts[digest[0] % len(user_prompts)]
+
+
+def get_daily_quote(user: str, topic: str = None) -> str:
+    """Return this user's quote for today without waiting on the LLM.
+
+    The first call of the day takes a quote from the pool (or a static fallback
+    while the pool is still cold); later calls that day return the same quote,
+    fallback included.
+    """
+    day = date.today().isoformat()
+    served_key = (user, day, topic)
+    with _lock:
+        quote = _served.get(served_key)
+    if quote:
+        return quote
+
+    prompt = _pick_prompt(user, day, topic)
+    with _lock:
+        pool = _pools.get(prompt)
+        if pool:
+            quote = pool.popleft()
+        else:
+            # Fall back to any other warm pool before using a static quote.
+            for other in _pools.values():
+                if other:
+                    quote = other.popleft()
+                    break
+    request_refill(prompt)
+
+    if not quote:
+        # Remembered like any other quote, so the user keeps it for the day once the pool warms.
+        digest = hashlib.sha256(f"{user}|{day}".encode("utf-8")).digest()
+        quote = FALLBACK_QUOTES[digest[0] % len(FALLBACK_QUOTES)]
+
+    with _lock:
+        if len(_served) >= MAX_SERVED_CACHE:
+            _served.clear()
+        _served[served_key] = quote
+    return quote
+
+
+def pool_sizes():
+    with _lock:
+        return {p: len(q) for p, q in _pools.items()}
@@ -1,5 +1,6 @@
 import streamlit as st
-from report_analyser import  extract_text_from_file, analyze_report_with_llm
+from report_cache import analyze_uploaded_report
+from report_analyser import MAX_REPORT_PAGES, TEXT_BLOCK_CHARS, was_truncated
 
 def report_analyser_page():
     st.title("📄 Upload & Analyze Medical Report")
@@ -9,13 +10,16 @@ def report_analyser_page():
     if uploaded_file:
         with st.spinner("Extracting text and analyzing..."):
             try:
-                report_text = extract_text_from_file(uploaded_file)
-                if not report_text.strip():
+                report_text, result, cached = analyze_uploaded_report(uploaded_file)
+                if not result:
                     st.warning("The uploaded file seems to be empty or unreadable.")
                     return
 
-                result = analyze_report_with_llm(report_text)
-                st.success("✅ Analysis Complete!")
+                st.success("✅ Analysis Complete!" + (" (loaded from a previous analysis)" if cached else ""))
+                if was_truncated(report_text):
+                    st.warning(f"This report is too long to analyze in full; only the first {MAX_REPORT_PAGES} "
+                               f"pages (PDF) or about {MAX_REPORT_PAGES * TEXT_BLOCK_CHARS:,} characters "
+                               f"(DOCX/TXT) were analyzed.")
 
                 st.markdown("### 🧠 Report Summary")
                 st.markdown(result)
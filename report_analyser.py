@@ -1,35 +1,233 @@
+import asyncio
+import io
+import multiprocessing
 import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from itertools import chain as chain_iters
 import fitz  # PyMuPDF for PDF
 import docx
-from dotenv import load_dotenv
-from langchain_groq import ChatGroq
+from pdf_worker import extract_pdf_range
 from langchain_core.prompts import ChatPromptTemplate
+from llm import get_chat, estimate_tokens
 
-load_dotenv()
+chat = get_chat("openai/gpt-oss-20b", temperature=0.2)
+RUN_CONFIG = {"metadata": {"agent": "report_analyser"}}
 
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+PAGE_BREAK = "\f"
+# Rough token budget per LLM call for report text (~4 characters per token).
+CHUNK_TOKEN_BUDGET = int(os.getenv("REPORT_CHUNK_TOKENS", 6000))
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", 4))
+# Map rounds over the notes before giving up on shrinking them; lab bundles can produce notes
+# about as long as the report, so whatever is left after this is truncated to one chunk.
+MAX_REDUCE_ROUNDS = 3
 
-chat = ChatGroq(
-    temperature=0.2,
-    model_name="openai/gpt-oss-20b",
-    groq_api_key=GROQ_API_KEY
-)
+# Extraction limits: uploads over MAX_REPORT_BYTES are rejected, pages (or DOCX/TXT blocks) past
+# MAX_REPORT_PAGES are dropped and a truncation note is added as a last page, so both the model
+# and the user are told.
+MAX_REPORT_BYTES = int(os.getenv("MAX_REPORT_BYTES", 50 * 1024 * 1024))
+MAX_REPORT_PAGES = int(os.getenv("MAX_REPORT_PAGES", 500))
+# PDFs with more pages than this are extracted across a process pool, PDF_PAGES_PER_TASK at a time.
+PARALLEL_PDF_PAGES = int(os.getenv("PARALLEL_PDF_PAGES", 40))
+PDF_PAGES_PER_TASK = 16
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", max(1, min(4, (os.cpu_count() or 2) - 1))))
+# DOCX and TXT have no pages; their text is grouped into blocks of about this many characters.
+TEXT_BLOCK_CHARS = 4000
+TRUNCATED_NOTE = (f"[Note: the report is longer than {MAX_REPORT_PAGES} pages; "
+                  f"only the first {MAX_REPORT_PAGES} were analyzed.]")
+TRUNCATED_TEXT_NOTE = (f"[Note: the report is longer than about {MAX_REPORT_PAGES * TEXT_BLOCK_CHARS:,} characters; "
+                       f"only the first part was analyzed.]")
 
-def extract_text_from_file(uploaded_file):
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+chunk_prompt = ChatPromptTemplate.from_messages([
+    ("system", "You extract findings from one part of a longer medical report. "
+               "List the diagnoses, test names with their values and reference ranges, abnormal results, "
+               "medications and recommendations that appear in this part. Be concise and factual; "
+               "do not add advice or information that is not in the text."),
+    ("human", "Part {index}:\n{chunk}")
+])
+
+def _read_capped(uploaded_file):
+    data = uploaded_file.read(MAX_REPORT_BYTES + 1)
+    if len(data) > MAX_REPORT_BYTES:
+        raise ValueError(f"The file is too large to analyze (limit {MAX_REPORT_BYTES // (1024 * 1024)} MB).")
+    return data
+
+
+def was_truncated(report_text) -> bool:
+    return bool(report_text) and (TRUNCATED_NOTE in report_text or TRUNCATED_TEXT_NOTE in report_text)
+
+
+def _get_pdf_pool():
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pdf_pool
+
+
+def _iter_parallel_pdf_pages(data, page_count):
+    # Workers open the PDF from a temp file, so the upload is not pickled into every task.
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        f.write(data)
+        path = f.name
+    try:
+        pool = _get_pdf_pool()
+        futures = [
+            pool.submit(extract_pdf_range, path, start, min(start + PDF_PAGES_PER_TASK, page_count))
+            for start in range(0, page_count, PDF_PAGES_PER_TASK)
+        ]
+        # Consume in submission order so page 1 is yielded as soon as its range is done.
+        for future in futures:
+            yield from future.result()
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _iter_pdf_pages(data):
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        total = doc.page_count
+        page_count = min(total, MAX_REPORT_PAGES)
+        parallel = page_count > PARALLEL_PDF_PAGES and PDF_WORKERS >= 2
+        if not parallel:
+            for i in range(page_count):
+                yield doc[i].get_text()
+    if parallel:
+        yield from _iter_parallel_pdf_pages(data, page_count)
+    if total > MAX_REPORT_PAGES:
+        yield TRUNCATED_NOTE
+
+
+def _iter_blocks(paragraphs):
+    block, size, count = [], 0, 0
+    for para in paragraphs:
+        block.append(para)
+        size += len(para) + 1
+        if size >= TEXT_BLOCK_CHARS:
+            yield "\n".join(block)
+            block, size = [], 0
+            count += 1
+            if count >= MAX_REPORT_PAGES:
+                if next(iter(paragraphs), None) is not None:
+                    yield TRUNCATED_TEXT_NOTE
+                return
+    if block:
+        yield "\n".join(block)
+
+
+def _iter_txt_lines(uploaded_file):
+    # Read raw lines so the cap counts bytes and the caller's file is left open
+    # (a TextIOWrapper would close it when collected).
+    read = 0
+    for line in uploaded_file:
+        read += len(line)
+        if read > MAX_REPORT_BYTES:
+            raise ValueError(f"The file is too large to analyze (limit {MAX_REPORT_BYTES // (1024 * 1024)} MB).")
+        yield line.decode("utf-8").rstrip("\r\n")
+
+
+def iter_report_pages(uploaded_file):
+    """Yield the report's text page by page (PDF) or in ~TEXT_BLOCK_CHARS blocks (DOCX/TXT)."""
     extension = uploaded_file.name.split(".")[-1].lower()
     if extension == "pdf":
-        doc = fitz.open(stream=uploaded_file.read(), filetype="pdf")
-        text = "\n".join(page.get_text() for page in doc)
+        yield from _iter_pdf_pages(_read_capped(uploaded_file))
     elif extension == "docx":
-        doc = docx.Document(uploaded_file)
-        text = "\n".join(p.text for p in doc.paragraphs)
+        doc = docx.Document(io.BytesIO(_read_capped(uploaded_file)))
+        yield from _iter_blocks(p.text for p in doc.paragraphs)
     elif extension == "txt":
-        text = uploaded_file.read().decode("utf-8")
+        yield from _iter_blocks(_iter_txt_lines(uploaded_file))
     else:
         raise ValueError("Unsupported file format. Please upload a PDF, DOCX, or TXT file.")
-    return text
 
-def analyze_report_with_llm(report_text):
+
+def extract_text_from_file(uploaded_file):
+    return PAGE_BREAK.join(iter_report_pages(uploaded_file))
+
+def _split_oversized(unit, budget):
+    # Fall back from paragraphs to lines to hard character cuts for a unit over budget.
+    for sep in ("\n\n", "\n"):
+        parts = [p for p in unit.split(sep) if p.strip()]
+        if len(parts) > 1:
+            return [piece for p in parts for piece in
+                    (_split_oversized(p, budget) if estimate_tokens(p) > budget else [p])]
+    size = budget * 4
+    return [unit[i:i + size] for i in range(0, len(unit), size)]
+
+
+def iter_chunks(pages, budget=CHUNK_TOKEN_BUDGET):
+    """Pack pages (or paragraphs of oversized pages) into chunks of at most `budget` tokens.
+
+    `pages` may be a lazy iterator; each chunk is yielded as soon as it is full.
+    """
+    current, current_tokens = [], 0
+    for page in pages:
+        if not page.strip():
+            continue
+        units = _split_oversized(page, budget) if estimate_tokens(page) > budget else [page]
+        for unit in units:
+            tokens = estimate_tokens(unit)
+            if current and current_tokens + tokens > budget:
+                yield "\n".join(current)
+                current, current_tokens = [], 0
+            current.append(unit)
+            current_tokens += tokens
+    if current:
+        yield "\n".join(current)
+
+
+def split_report(text, budget=CHUNK_TOKEN_BUDGET):
+    return list(iter_chunks(text.split(PAGE_BREAK), budget))
+
+
+def summarize_chunks(chunks):
+    """Map step: extract findings from every chunk concurrently, keeping report order.
+
+    Chunks are submitted as they arrive, so a lazy `chunks` iterator overlaps
+    extraction of later pages with analysis of earlier ones.
+    """
+    chain = chunk_prompt | chat
+
+    def run(index, chunk):
+        return chain.invoke({"index": index, "chunk": chunk}, config=RUN_CONFIG).content
+
+    with ThreadPoolExecutor(max_workers=REPORT_WORKERS) as pool:
+        futures = [pool.submit(run, i, c) for i, c in enumerate(chunks, start=1)]
+        notes = [f.result() for f in futures]
+    return _join_notes(notes)
+
+
+async def asummarize_chunks(chunks):
+    """Async map step; at most REPORT_WORKERS chunk calls are in flight at once."""
+    chain = chunk_prompt | chat
+    limit = asyncio.Semaphore(REPORT_WORKERS)
+
+    async def run(index, chunk):
+        async with limit:
+            return (await chain.ainvoke({"index": index, "chunk": chunk}, config=RUN_CONFIG)).content
+
+    notes = await asyncio.gather(*(run(i, c) for i, c in enumerate(chunks, start=1)))
+    return _join_notes(notes)
+
+
+def _join_notes(notes):
+    return "\n\n".join(f"Part {i}:\n{n}" for i, n in enumerate(notes, start=1))
+
+
+def _truncate_notes(notes, budget=CHUNK_TOKEN_BUDGET):
+    limit = budget * 4
+    if len(notes) <= limit:
+        return notes
+    return notes[:limit] + "\n\n[Findings from the remaining parts were cut to fit.]"
+
+
+def analysis_prompt(map_reduced: bool = False):
+    """Prompt for the final analysis; map-reduced reports arrive as the findings of each part."""
     system_prompt = """
 You are a helpful and knowledgeable medical assistant.
 You will analyze medical reports and explain them in a way that is simple, supportive, and easy for a patient to understand.
@@ -70,12 +268,75 @@ Your tone must always be:
 - Avoid overly technical jargon; always explain in plain words.
 """
 
+    human_prompt = "Here is the report text:\n{report_text}"
+    if map_reduced:
+        human_prompt = ("The report was too long to read at once, so the findings from each part "
+                        "are listed below in order. Analyze them as one report:\n{report_text}")
 
-    prompt = ChatPromptTemplate.from_messages([
+    return ChatPromptTemplate.from_messages([
         ("system", system_prompt),
-        ("human", f"Here is the report text:\n{report_text}")
+        ("human", human_prompt)
     ])
 
-    chain = prompt | chat
-    response = chain.invoke({})
+
+def _report_chunks(report):
+    """(text, None) when the report fits one call, (None, chunks) when it has to be
+    map-reduced, or (None, None) when it has no text."""
+    pages = report.split(PAGE_BREAK) if isinstance(report, str) else report
+    chunks = iter_chunks(pages)
+    first = next(chunks, None)
+    if first is None:
+        return None, None
+    second = next(chunks, None)
+    if second is None:
+        return first, None
+    return None, chain_iters([first, second], chunks)
+
+
+def analyze_report_with_llm(report):
+    """Analyze a report given as text, or as an iterable of page texts (e.g. iter_report_pages).
+
+    Returns an empty string without calling the model when the report has no text.
+    """
+    report_text, chunks = _report_chunks(report)
+    if report_text is None and chunks is None:
+        return ""
+
+    # Reports over the budget are map-reduced: findings per chunk, then the usual analysis over
+    # the combined notes. Repeat in case the notes themselves are still too long.
+    map_reduced = chunks is not None
+    rounds = 0
+    while chunks is not None:
+        report_text = summarize_chunks(chunks)
+        rounds += 1
+        chunks = split_report(report_text)
+        if len(chunks) <= 1:
+            chunks = None
+        elif rounds >= MAX_REDUCE_ROUNDS:
+            report_text, chunks = _truncate_notes(report_text), None
+
+    chain = analysis_prompt(map_reduced) | chat
+    response = chain.invoke({"report_text": report_text}, config=RUN_CONFIG)
+    return response.content
+
+
+async def aanalyze_report_with_llm(report):
+    """Async analyze_report_with_llm. Page extraction is blocking, so pass text or extracted pages."""
+    report_text, chunks = _report_chunks(report)
+    if report_text is None and chunks is None:
+        return ""
+
+    map_reduced = chunks is not None
+    rounds = 0
+    while chunks is not None:
+        report_text = await asummarize_chunks(chunks)
+        rounds += 1
+        chunks = split_report(report_text)
+        if len(chunks) <= 1:
+            chunks = None
+        elif rounds >= MAX_REDUCE_ROUNDS:
+            report_text, chunks = _truncate_notes(report_text), None
+
+    chain = analysis_prompt(map_reduced) | chat
+    response = await chain.ainvoke({"report_text": report_text}, config=RUN_CONFIG)
     return response.content
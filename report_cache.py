@@ -0,0 +1,163 @@
+# report_cache.py
+import asyncio
+import hashlib
+import os
+import threading
+from datetime import datetime
+
+from pymongo import ASCENDING
+
+from cache import normalize_text
+from db import patients_collection
+from profiler import profiled
+from report_analyser import extract_text_from_file, analyze_report_with_llm, aanalyze_report_with_llm, MAX_REPORT_BYTES
+
+# Total bytes of cached text + analysis kept before the least recently used reports are evicted.
+MAX_CACHE_BYTES = int(os.getenv("REPORT_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+# Extracted text above this size is not stored (the analysis still is), keeping documents well under 16 MB.
+MAX_STORED_TEXT = 4 * 1024 * 1024
+# Bump when the analysis prompt or chunking changes so old analyses are not reused; it is part of
+# both the file and the text key, so neither lookup finds entries written under another version.
+ANALYSIS_VERSION = "1"
+# The size total is an aggregation over the whole collection, so only check it every this many stores.
+EVICT_EVERY = int(os.getenv("REPORT_CACHE_EVICT_EVERY", 50))
+
+# Two kinds of documents share the collection:
+#   {"_id": "file:<sha256 of version + bytes>", "text_key": ...}  -> points at a text entry
+#   {"_id": "text:<sha256 of normalized text>", "text", "analysis", "size", "last_access"}
+report_cache_collection = patients_collection.database["report_cache"]
+
+_stores = 0
+_stores_lock = threading.Lock()
+
+
+def file_fingerprint(data: bytes) -> str:
+    return "file:" + hashlib.sha256(f"{ANALYSIS_VERSION}\x00".encode("utf-8") + data).hexdigest()
+
+
+def text_fingerprint(text: str) -> str:
+    return "text:" + hashlib.sha256(f"{ANALYSIS_VERSION}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+def _touch(text_key):
+    return report_cache_collection.find_one_and_update(
+        {"_id": text_key},
+        {"$set": {"last_access": datetime.utcnow()}},
+        projection={"_id": 0, "text": 1, "analysis": 1},
+    )
+
+
+@profiled("db:report_cache_file")
+def lookup_file(file_key):
+    link = report_cache_collection.find_one({"_id": file_key}, {"text_key": 1})
+    if not link:
+        return None
+    return _touch(link["text_key"])
+
+
+@profiled("db:report_cache_text")
+def lookup_text(text_key):
+    return _touch(text_key)
+
+
+def link_file(file_key, text_key):
+    report_cache_collection.update_one(
+        {"_id": file_key}, {"$set": {"text_key": text_key, "size": 0}}, upsert=True
+    )
+
+
+def store(file_key, text_key, text, analysis):
+    stored_text = text if len(text) <= MAX_STORED_TEXT else None
+    size = len(analysis.encode("utf-8")) + (len(stored_text.encode("utf-8")) if stored_text else 0)
+    report_cache_collection.update_one(
+        {"_id": text_key},
+        {"$set": {
+            "text": stored_text,
+            "analysis": analysis,
+            "size": size,
+            "last_access": datetime.utcnow(),
+        }},
+        upsert=True,
+    )
+    link_file(file_key, text_key)
+    global _stores
+    with _stores_lock:
+        _stores += 1
+        due = (_stores - 1) % EVICT_EVERY == 0
+    if due:
+        evict()
+
+
+def evict(max_bytes=MAX_CACHE_BYTES):
+    """Delete least recently used text entries (and links to them) until under `max_bytes`."""
+    totals = list(report_cache_collection.aggregate([{"$group": {"_id": None, "total": {"$sum": "$size"}}}]))
+    total = totals[0]["total"] if totals else 0
+    if total <= max_bytes:
+        return 0
+    removed = []
+    cursor = report_cache_collection.find(
+        {"_id": {"$regex": "^text:"}}, {"size": 1}
+    ).sort("last_access", ASCENDING)
+    for doc in cursor:
+        if total <= max_bytes:
+            break
+        removed.append(doc["_id"])
+        total -= doc.get("size", 0)
+    if removed:
+        report_cache_collection.delete_many({"_id": {"$in": removed}})
+        report_cache_collection.delete_many({"text_key": {"$in": removed}})
+    return len(removed)
+
+
+def analyze_uploaded_report(uploaded_file):
+    """Return (report_text, analysis, cached) for an upload, reusing earlier analyses when possible.
+
+    Lookup order: exact file bytes, then normalized extracted text, then the LLM.
+    `report_text` is None on a byte-level hit for a report whose text was too large to store.
+    """
+    data = uploaded_file.getvalue()
+    if len(data) > MAX_REPORT_BYTES:
+        raise ValueError(f"The file is too large to analyze (limit {MAX_REPORT_BYTES // (1024 * 1024)} MB).")
+    file_key = file_fingerprint(data)
+    hit = lookup_file(file_key)
+    if hit:
+        return hit.get("text"), hit["analysis"], True
+
+    report_text = extract_text_from_file(uploaded_file)
+    if not report_text.strip():
+        return report_text, "", False
+    text_key = text_fingerprint(report_text)
+    hit = lookup_text(text_key)
+    if hit:
+        link_file(file_key, text_key)
+        return report_text, hit["analysis"], True
+
+    analysis = analyze_report_with_llm(report_text)
+    if analysis:
+        store(file_key, text_key, report_text, analysis)
+    return report_text, analysis, False
+
+
+async def aanalyze_uploaded_report(uploaded_file):
+    """Async analyze_uploaded_report; cache lookups and text extraction run in worker threads."""
+    data = uploaded_file.getvalue()
+    if len(data) > MAX_REPORT_BYTES:
+        raise ValueError(f"The file is too large to analyze (limit {MAX_REPORT_BYTES // (1024 * 1024)} MB).")
+    file_key = file_fingerprint(data)
+    hit = await asyncio.to_thread(lookup_file, file_key)
+    if hit:
+        return hit.get("text"), hit["analysis"], True
+
+    report_text = await asyncio.to_thread(extract_text_from_file, uploaded_file)
+    if not report_text.strip():
+        return report_text, "", False
+    text_key = text_fingerprint(report_text)
+    hit = await asyncio.to_thread(lookup_text, text_key)
+    if hit:
+        await asyncio.to_thread(link_file, file_key, text_key)
+        return report_text, hit["analysis"], True
+
+    analysis = await aanalyze_report_with_llm(report_text)
+    if analysis:
+        await asyncio.to_thread(store, file_key, text_key, report_text, analysis)
+    return report_text, analysis, False
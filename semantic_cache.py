@@ -0,0 +1,129 @@
+# semantic_cache.py
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from cache import content_key
+from llm_metrics import register_gauges
+
+EMBEDDING_MODEL = os.getenv("SEMANTIC_CACHE_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+# Cosine similarity at or above which two questions count as the same question.
+SIMILARITY_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.92))
+MAX_ENTRIES_PER_USER = 200
+ENABLED = os.getenv("SEMANTIC_CACHE", "1") != "0"
+# After a failed model load (e.g. no network for the download), try again this much later.
+RETRY_SECONDS = int(os.getenv("SEMANTIC_CACHE_RETRY_SECONDS", 600))
+
+_lock = threading.Lock()
+_model_lock = threading.Lock()
+_model = None        # (tokenizer, model), loaded in the background by warm()
+_loading = False
+_failed_at = None
+_entries = {}        # email -> deque of (vector, context_fp, question, answer, latency)
+metrics = {"hits": 0, "misses": 0, "seconds_saved": 0.0, "lookup_seconds": 0.0, "lookups": 0}
+
+
+def context_fingerprint(context: str) -> str:
+    return content_key(context)
+
+
+def _load_model():
+    global _model, _loading, _failed_at
+    try:
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+        torch.set_num_threads(max(1, min(4, os.cpu_count() or 1)))
+        tokenizer = AutoTokenizer.from_pretrained(EMBEDDING_MODEL)
+        model = AutoModel.from_pretrained(EMBEDDING_MODEL).eval()
+        _model = (tokenizer, model)
+        _failed_at = None
+    except Exception:
+        # No transformers/torch or no model download: run without the cache until the next retry.
+        _failed_at = time.time()
+    finally:
+        _loading = False
+
+
+def warm():
+    """Load the embedding model on a background thread; the cache is skipped until it is ready."""
+    global _loading
+    if not ENABLED:
+        return
+    with _model_lock:
+        if _model is not None or _loading:
+            return
+        if _failed_at is not None and time.time() - _failed_at < RETRY_SECONDS:
+            return
+        _loading = True
+    threading.Thread(target=_load_model, name="semantic-cache-model", daemon=True).start()
+
+
+def embed(text: str):
+    """Unit-length sentence embedding (mean-pooled), or None while no model is loaded."""
+    loaded = _model
+    if loaded is None:
+        warm()
+        return None
+    import torch
+    tokenizer, model = loaded
+    with torch.no_grad():
+        batch = tokenizer([text.strip().lower()], padding=True, truncation=True, max_length=128, return_tensors="pt")
+        output = model(**batch).last_hidden_state
+        mask = batch["attention_mask"].unsqueeze(-1).float()
+        pooled = (output * mask).sum(1) / mask.sum(1).clamp(min=1e-9)
+    vector = pooled[0].numpy()
+    return vector / (np.linalg.norm(vector) or 1.0)
+
+
+def lookup(email: str, question: str, context_fp: str):
+    """Return (answer, vector). `answer` is None on a miss; pass `vector` back to store()."""
+    if not ENABLED:
+        return None, None
+    started = time.perf_counter()
+    vector = embed(question)
+    best, best_score = None, SIMILARITY_THRESHOLD
+    if vector is not None:
+        with _lock:
+            candidates = [e for e in _entries.get(email, ()) if e[1] == context_fp]
+        for entry in candidates:
+            score = float(np.dot(vector, entry[0]))
+            if score >= best_score:
+                best, best_score = entry, score
+    with _lock:
+        metrics["lookups"] += 1
+        metrics["lookup_seconds"] += time.perf_counter() - started
+        if best is None:
+            metrics["misses"] += 1
+            return None, vector
+        metrics["hits"] += 1
+        metrics["seconds_saved"] += best[4]
+    return best[3], vector
+
+
+def store(email: str, question: str, context_fp: str, answer: str, latency: float, vector=None):
+    if not ENABLED or not answer:
+        return
+    if vector is None:
+        vector = embed(question)
+        if vector is None:
+            return
+    with _lock:
+        entries = _entries.setdefault(email, deque(maxlen=MAX_ENTRIES_PER_USER))
+        entries.append((vector, context_fp, question, answer, latency))
+
+
+def stats():
+    with _lock:
+        m = dict(metrics)
+    total = m["hits"] + m["misses"]
+    m["hit_rate"] = round(m["hits"] / total, 3) if total else 0.0
+    m["avg_lookup_ms"] = round(1000 * m["lookup_seconds"] / m["lookups"], 2) if m["lookups"] else 0.0
+    m["model_loaded"] = _model is not None
+    m["model_loading"] = _loading
+    return m
+
+
+register_gauges("semantic_cache", stats)
@@ -1,37 +1,23 @@
 import streamlit as st
-from db import patients_collection, appointments_collection, records_collection
+from db import patients_collection
+from appointments import appointment_page, next_appointment, describe_next_appointment, format_appointment_summary
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_groq import ChatGroq
+from llm import get_chat
+from chat_log import log_chat
+from chat_memory import recent_turns, build_history, schedule_summary_update
 from dotenv import load_dotenv
-from datetime import datetime
 import os
 
 load_dotenv()
 
-chat = ChatGroq(
-    temperature=0.4,
-    model_name="openai/gpt-oss-120b",
-    groq_api_key=os.getenv("GROQ_API_KEY")
-)
-
-def get_next_appointment(appointments):
-    now = datetime.now()
-    upcoming = sorted(
-        [a for a in appointments if 'start' in a and datetime.fromisoformat(a['start']) > now],
-        key=lambda x: datetime.fromisoformat(x['start'])
-    )
-    return upcoming[0] if upcoming else None
+chat = get_chat("openai/gpt-oss-120b", temperature=0.4)
 
 def fetch_chat_history(email):
-    return list(records_collection.find({"email": email}))
+    return recent_turns(email)
 
 def log_chat_message(email, question, answer):
-    records_collection.insert_one({
-        "email": email,
-        "timestamp": datetime.utcnow(),
-        "question": question,
-        "answer": answer
-    })
+    log_chat(email, question, answer)
+    schedule_summary_update(email)
 
 def sidebar_chatbot():
     st.sidebar.markdown("## 🤖 Ask Anything To Your Health Bot")
@@ -42,8 +28,6 @@ def sidebar_chatbot():
 
     email = st.session_state.email
     patient = patients_collection.find_one({"email": email})
-    appointments = list(appointments_collection.find({"email": email}))
-    history = fetch_chat_history(email)
 
     if not patient:
         st.sidebar.warning("Patient record not found.")
@@ -54,23 +38,10 @@ def sidebar_chatbot():
     conditions = patient.get("conditions", "Not specified")
     medications = patient.get("medications", "Not specified")
 
-    next_apt = get_next_appointment(appointments)
-    if next_apt:
-        apt_time = datetime.fromisoformat(next_apt['start']).strftime("%A at %I:%M %p")
-        apt_title = next_apt.get("title", "No title provided")
-        apt_info = f"Your next appointment is '{apt_title}' scheduled for {apt_time}."
-    else:
-        apt_info = "You have no upcoming appointments at the moment."
-
-    appointment_summary = "\n".join([
-        f"- {a.get('title', 'No title')} on {datetime.fromisoformat(a['start']).strftime('%Y-%m-%d %I:%M %p')}"
-        for a in appointments if 'start' in a
-    ]) or "No appointments on record."
-
-    chat_history = "\n".join([
-        f"User: {msg['question']}\nAssistant: {msg['answer']}"
-        for msg in history
-    ]) or "No previous conversations."
+    apt_info = describe_next_appointment(next_appointment(email))
+    appointment_summary = format_appointment_summary(appointment_page(email))
+
+    chat_history = build_history(email) or "No previous conversations."
 
     full_context = f"""
     Patient Name: {name}
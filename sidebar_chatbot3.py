@@ -1,8 +1,10 @@
 import streamlit as st
-from db import patients_collection, appointments_collection, records_collection
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_groq import ChatGroq
-from datetime import datetime
+from llm import get_chat
+from chat_log import log_chat
+from patient_context import get_patient_context
+import semantic_cache
+import time
 import os
 from dotenv import load_dotenv
 import uuid
@@ -10,19 +12,13 @@ import streamlit.components.v1 as components
 
 load_dotenv()
 
-chat = ChatGroq(
-    temperature=0.4,
-    model_name="openai/gpt-oss-120b",
-    groq_api_key=os.getenv("GROQ_API_KEY")
-)
+chat = get_chat("openai/gpt-oss-120b", temperature=0.4)
 
-def get_next_appointment(appointments):
-    now = datetime.now()
-    upcoming = sorted(
-        [a for a in appointments if 'start' in a and datetime.fromisoformat(a['start']) > now],
-        key=lambda x: datetime.fromisoformat(x['start'])
-    )
-    return upcoming[0] if upcoming else None
+# Built once so the system message and record prefix are identical on every call.
+chat_prompt = ChatPromptTemplate.from_messages([
+    ("system", "You are a helpful and friendly AI health assistant. Greet the patient by name. Use the full patient record below to respond accurately and avoid hallucinations. Answer questions about any appointment (past or future) based on the record."),
+    ("human", "Patient Record:\n{context}\n\nUser Question: {question}")
+])
 
 def sidebar_chatbot():
     st.sidebar.markdown("## 🤖 Ask Anything To Your Health Bot")
@@ -31,43 +27,11 @@ def sidebar_chatbot():
         st.sidebar.info("Log in to chat with your assistant.")
         return
 
-    patient = patients_collection.find_one({"email": st.session_state.email})
-    appointments = list(appointments_collection.find({"email": st.session_state.email}))
-    if not patient:
+    entry = get_patient_context(st.session_state.email)
+    if not entry:
         st.sidebar.warning("Patient record not found.")
         return
-
-    name = patient.get("name", "there")
-    symptoms = patient.get("symptoms", "Not specified")
-    conditions = patient.get("conditions", "Not specified")
-    medications = patient.get("medications", "Not specified")
-
-    next_apt = get_next_appointment(appointments)
-    if next_apt:
-        apt_time = datetime.fromisoformat(next_apt['start']).strftime("%A at %I:%M %p")
-        apt_title = next_apt.get("title", "No title provided")
-        apt_info = f"Your next appointment is '{apt_title}' scheduled for {apt_time}."
-    else:
-        apt_info = "You have no upcoming appointments at the moment."
-
-    appointment_summary = "\n".join([
-        f"- {a.get('title', 'No title')} on {datetime.fromisoformat(a['start']).strftime('%Y-%m-%d %I:%M %p')}"
-        for a in appointments if 'start' in a
-    ]) or "No appointments on record."
-
-    full_context = f"""
-Patient Name: {name}
-Email: {patient.get('email')}
-Symptoms: {symptoms}
-Conditions: {conditions}
-Medications: {medications}
-
-All Appointments:
-{appointment_summary}
-
-Upcoming Appointment Info:
-{apt_info}
-    """
+    full_context = entry["context"]
 
     # Initialize session state variables
     if "chatbot_response" not in st.session_state:
@@ -285,34 +249,48 @@ Upcoming Appointment Info:
     if user_input:
         st.session_state.last_user_message = user_input
         
-        # Generate response
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", "You are a helpful and friendly AI health assistant. Greet the patient by name. Use the full patient record below to respond accurately and avoid hallucinations. Answer questions about any appointment (past or future) based on the record."),
-            ("human", "Patient Record:\n{context}\n\nUser Question: {question}")
-        ])
-
-        chain = prompt | chat
-        response = chain.invoke({
-            "context": full_context,
-            "question": user_input
-        })
-
         email = st.session_state.email
-        answer = response.content
+        context_fp = semantic_cache.context_fingerprint(full_context)
+        answer, question_vector = semantic_cache.lookup(email, user_input, context_fp)
+
+        if answer is None:
+            # Generate response
+            started = time.perf_counter()
+            chain = chat_prompt | chat
+            response = chain.invoke({
+                "context": full_context,
+                "question": user_input
+            })
+            answer = response.content
+            semantic_cache.store(
+                email, user_input, context_fp, answer, time.perf_counter() - started, question_vector
+            )
+
+            usage = getattr(response, "usage_metadata", None) or {}
+            st.session_state.chatbot_usage = {
+                "context_tokens": entry["context_tokens"],
+                "input_tokens": usage.get("input_tokens"),
+                "cached_tokens": (usage.get("input_token_details") or {}).get("cache_read"),
+                "output_tokens": usage.get("output_tokens"),
+            }
+        else:
+            st.session_state.chatbot_usage = None
+
         st.session_state.chatbot_response = answer
 
         # Store in database
-        records_collection.insert_one({
-            "email": email,
-            "question": user_input,  
-            "answer": answer,
-            "timestamp": datetime.utcnow()
-        })
+        log_chat(email, user_input, answer)
 
     # Display response
     if st.session_state.chatbot_response:
         st.sidebar.markdown("### 🤖 Assistant Response:")
         st.sidebar.success(st.session_state.chatbot_response)
+        usage = st.session_state.get("chatbot_usage")
+        if usage:
+            st.sidebar.caption(
+                f"Tokens sent: {usage['input_tokens'] or '?'} "
+                f"(cached: {usage['cached_tokens'] or 0}, patient record ≈ {usage['context_tokens']})"
+            )
 
         # Text-to-Speech button
         speak_html = f"""
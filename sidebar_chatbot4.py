@@ -1,8 +1,9 @@
 import streamlit as st
-from db import patients_collection, appointments_collection, records_collection
+from db import patients_collection
+from appointments import appointment_page, next_appointment, describe_next_appointment, format_appointment_summary
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_groq import ChatGroq
-from datetime import datetime
+from llm import get_chat
+from chat_log import log_chat
 import os
 from dotenv import load_dotenv
 import uuid
@@ -10,19 +11,7 @@ import streamlit.components.v1 as components
 
 load_dotenv()
 
-chat = ChatGroq(
-    temperature=0.4,
-    model_name="llama-3.1-8b-instant",
-    groq_api_key=os.getenv("GROQ_API_KEY")
-)
-
-def get_next_appointment(appointments):
-    now = datetime.now()
-    upcoming = sorted(
-        [a for a in appointments if 'start' in a and datetime.fromisoformat(a['start']) > now],
-        key=lambda x: datetime.fromisoformat(x['start'])
-    )
-    return upcoming[0] if upcoming else None
+chat = get_chat("llama-3.1-8b-instant", temperature=0.4)
 
 def sidebar_chatbot():
     st.sidebar.markdown("## 🤖 Ask Anything To Your Health Bot")
@@ -32,7 +21,6 @@ def sidebar_chatbot():
         return
 
     patient = patients_collection.find_one({"email": st.session_state.email})
-    appointments = list(appointments_collection.find({"email": st.session_state.email}))
     if not patient:
         st.sidebar.warning("Patient record not found.")
         return
@@ -42,18 +30,8 @@ def sidebar_chatbot():
     conditions = patient.get("conditions", "Not specified")
     medications = patient.get("medications", "Not specified")
 
-    next_apt = get_next_appointment(appointments)
-    if next_apt:
-        apt_time = datetime.fromisoformat(next_apt['start']).strftime("%A at %I:%M %p")
-        apt_title = next_apt.get("title", "No title provided")
-        apt_info = f"Your next appointment is '{apt_title}' scheduled for {apt_time}."
-    else:
-        apt_info = "You have no upcoming appointments at the moment."
-
-    appointment_summary = "\n".join([
-        f"- {a.get('title', 'No title')} on {datetime.fromisoformat(a['start']).strftime('%Y-%m-%d %I:%M %p')}"
-        for a in appointments if 'start' in a
-    ]) or "No appointments on record."
+    apt_info = describe_next_appointment(next_appointment(st.session_state.email))
+    appointment_summary = format_appointment_summary(appointment_page(st.session_state.email))
 
     full_context = f"""
 Patient Name: {name}
@@ -159,12 +137,7 @@ Upcoming Appointment Info:
         answer = response.content
         st.session_state.chatbot_response = answer
 
-        records_collection.insert_one({
-            "email": st.session_state.email,
-            "question": user_input,
-            "answer": answer,
-            "timestamp": datetime.utcnow()
-        })
+        log_chat(st.session_state.email, user_input, answer)
 
     if st.session_state.chatbot_response:
         st.sidebar.markdown("### 🤖 Assistant Response:")
@@ -1,13 +1,59 @@
 import streamlit as st
 from PIL import Image, UnidentifiedImageError
-import pytesseract
-from dotenv import load_dotenv
-import os
-from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
-load_dotenv()
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+from llm import get_chat
+from ocr import extract_text
+from medicine_index import medicine_index
+
+RUN_CONFIG = {"metadata": {"agent": "tablet_analyser"}}
+
+
+def _description_chain():
+    system_prompt = (
+        "You are a skilled pharmacist. Based on the medicine name or composition given, "
+        "describe what the tablet is used for, the medical condition it treats, and how it works. "
+        "Keep it simple and clear for patients."
+    )
+    human_prompt = (
+        "Medicine or composition: {medicine_text}. Explain what it does, and what condition it is commonly used for."
+    )
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", system_prompt),
+        ("human", human_prompt)
+    ])
+    chat = get_chat("openai/gpt-oss-120b", temperature=0.3)
+    return prompt | chat
+
+
+def medicine_description_stream(medicine_text: str):
+    """Yield the pharmacist-style description of the medicine as it is generated."""
+    for chunk in _description_chain().stream({"medicine_text": medicine_text}, config=RUN_CONFIG):
+        yield chunk.content
+
+
+async def amedicine_description_stream(medicine_text: str):
+    async for chunk in _description_chain().astream({"medicine_text": medicine_text}, config=RUN_CONFIG):
+        yield chunk.content
+
+
+def describe_medicine(medicine_text: str) -> str:
+    """Description from the local medicine index when known, otherwise from the LLM (then indexed)."""
+    hit = medicine_index.lookup(medicine_text)
+    if hit:
+        return hit[0]["description"]
+    output = "".join(medicine_description_stream(medicine_text))
+    medicine_index.add(medicine_text, output)
+    return output
+
+
+async def adescribe_medicine(medicine_text: str) -> str:
+    hit = medicine_index.lookup(medicine_text)
+    if hit:
+        return hit[0]["description"]
+    output = "".join([piece async for piece in amedicine_description_stream(medicine_text)])
+    medicine_index.add(medicine_text, output)
+    return output
+
 
 def tablet_analyzer_page():
     st.title("💊 Tablet Strip Analyzer")
@@ -17,32 +63,20 @@ def tablet_analyzer_page():
             image = Image.open(uploaded_file).convert("RGB")
             st.image(image, caption="Uploaded Tablet Image", use_column_width=True)
             with st.spinner("🔍 Analyzing image for text..."):
-                extracted_text = pytesseract.image_to_string(image)
+                extracted_text = extract_text(image)
                 cleaned_text = extracted_text.strip().replace("\n", " ")
             st.markdown("**📄 Extracted Text:**")
             st.code(cleaned_text or "No text found.", language="text")
             if cleaned_text:
-                system_prompt = (
-                    "You are a skilled pharmacist. Based on the medicine name or composition given, "
-                    "describe what the tablet is used for, the medical condition it treats, and how it works. "
-                    "Keep it simple and clear for patients."
-                )
-                human_prompt = (
-                    "Medicine or composition: {medicine_text}. Explain what it does, and what condition it is commonly used for."
-                )
-                prompt = ChatPromptTemplate.from_messages([
-                    ("system", system_prompt),
-                    ("human", human_prompt)
-                ])
-                chat = ChatGroq(
-                    temperature=0.3,
-                    model_name="openai/gpt-oss-120b",
-                    groq_api_key=GROQ_API_KEY
-                )
-                chain = prompt | chat
                 st.markdown("**🤖 Medicine Description:**")
-                output = "".join(chunk.content for chunk in chain.stream({"medicine_text": cleaned_text}))
-                st.success(output)
+                hit = medicine_index.lookup(cleaned_text)
+                if hit:
+                    output = hit[0]["description"]
+                    st.success(output)
+                    st.caption(f"From the local medicine index (match {hit[1]:.0%}).")
+                else:
+                    output = st.write_stream(medicine_description_stream(cleaned_text))
+                    medicine_index.add(cleaned_text, output)
                 st.session_state["medicine_description"] = output
                 return output
             else:
@@ -0,0 +1,146 @@
+# tablet_batch.py
+"""Batch tablet-strip analysis over a directory of images.
+
+    python tablet_batch.py photos/ --output results.jsonl --llm-concurrency 4
+
+Each image is written as one JSON line once its description is known.
+Re-running with the same output file skips images already recorded there
+without an error; OCR text is checkpointed to <output>.ocr as each image
+finishes, so an interrupted run does not redo its OCR.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from PIL import Image, UnidentifiedImageError
+
+from medicine_index import medicine_index, normalize
+from ocr import OCR_WORKERS, init_worker, extract_text_inline
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def list_images(directory):
+    return sorted(
+        os.path.join(directory, f) for f in os.listdir(directory)
+        if f.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+def _read_jsonl(path):
+    # A truncated last line (from an interrupted run) is skipped.
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+    except OSError:
+        return
+
+
+def load_done(output_path):
+    """Files recorded in the output JSONL without an error; failed ones are retried."""
+    return {r["file"] for r in _read_jsonl(output_path) if "file" in r and r.get("error") is None}
+
+
+def load_ocr_checkpoint(checkpoint_path):
+    """file -> OCR text for images whose OCR finished in an earlier run."""
+    return {r["file"]: r["ocr_text"] for r in _read_jsonl(checkpoint_path) if "file" in r and "ocr_text" in r}
+
+
+def ocr_file(path):
+    # Runs in a pool worker; returns (path, text, error).
+    try:
+        with Image.open(path) as image:
+            return path, extract_text_inline(image).strip(), None
+    except UnidentifiedImageError:
+        return path, "", "not a readable image"
+    except Exception as e:
+        return path, "", str(e)
+
+
+def progress(stage, done, total, path):
+    print(f"[{stage} {done}/{total}] {os.path.basename(path)}", file=sys.stderr, flush=True)
+
+
+def run_batch(directory, output_path, ocr_workers=OCR_WORKERS, llm_concurrency=4):
+    """OCR every new image, describe each distinct medicine text once, append results as JSONL."""
+    from tablet_analyser import describe_medicine
+
+    done = load_done(output_path)
+    pending = [p for p in list_images(directory) if p not in done]
+    if not pending:
+        print("Nothing to do: every image is already in the output.", file=sys.stderr)
+        return 0
+
+    # 1. OCR in worker processes, each with a warm engine, checkpointing each image as it finishes.
+    checkpoint_path = output_path + ".ocr"
+    checkpoint = load_ocr_checkpoint(checkpoint_path)
+    ocr_results = {p: (checkpoint[p], None) for p in pending if p in checkpoint}
+    to_ocr = [p for p in pending if p not in ocr_results]
+    if ocr_results:
+        print(f"Reusing OCR text for {len(ocr_results)} images from {checkpoint_path}.", file=sys.stderr)
+    # Spawn, not fork: the parent may already have imported tablet_analyser/llm and started threads.
+    spawn = multiprocessing.get_context("spawn")
+    with open(checkpoint_path, "a", encoding="utf-8") as ck, \
+            ProcessPoolExecutor(max_workers=ocr_workers, initializer=init_worker, mp_context=spawn) as pool:
+        futures = [pool.submit(ocr_file, p) for p in to_ocr]
+        for i, future in enumerate(as_completed(futures), start=1):
+            path, text, error = future.result()
+            ocr_results[path] = (text, error)
+            if error is None:
+                ck.write(json.dumps({"file": path, "ocr_text": text}, ensure_ascii=False) + "\n")
+                ck.flush()
+            progress("ocr", i, len(to_ocr), path)
+
+    # 2. Group files by recognized drug (else by normalized text) so each medicine goes to the LLM once.
+    groups = {}
+    with open(output_path, "a", encoding="utf-8") as out:
+        def write(record):
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+
+        for path in pending:
+            text, error = ocr_results[path]
+            if error or not text:
+                write({"file": path, "ocr_text": text, "description": None,
+                       "error": error or "no text found"})
+                continue
+            groups.setdefault(medicine_index.identify(text)[0] or normalize(text), []).append((path, text))
+
+        # 3. Describe unique texts with bounded concurrency; write every file in the group.
+        with ThreadPoolExecutor(max_workers=llm_concurrency) as pool:
+            futures = {pool.submit(describe_medicine, members[0][1]): members for members in groups.values()}
+            for i, future in enumerate(as_completed(futures), start=1):
+                members = futures[future]
+                try:
+                    description, error = future.result(), None
+                except Exception as e:
+                    description, error = None, str(e)
+                for path, text in members:
+                    write({"file": path, "ocr_text": text, "description": description, "error": error})
+                progress("llm", i, len(futures), members[0][0])
+
+    print(f"Processed {len(pending)} images, {len(groups)} distinct medicine texts.", file=sys.stderr)
+    return len(pending)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze a directory of tablet-strip photos.")
+    parser.add_argument("directory", help="folder containing .jpg/.jpeg/.png images")
+    parser.add_argument("--output", default="tablet_results.jsonl", help="JSONL file to append results to")
+    parser.add_argument("--ocr-workers", type=int, default=OCR_WORKERS)
+    parser.add_argument("--llm-concurrency", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    run_batch(args.directory, args.output, args.ocr_workers, args.llm_concurrency)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
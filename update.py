@@ -1,5 +1,7 @@
 import streamlit as st
 from db import patients_collection
+from patient_context import invalidate_patient_context
+from profiler import section
 
 def profile_page():
     st.title("👤 My Profile")
@@ -8,7 +10,8 @@ def profile_page():
         st.warning("You must be logged in to view this page.")
         return
 
-    user = patients_collection.find_one({"email": st.session_state.email})
+    with section("db:profile_lookup"):
+        user = patients_collection.find_one({"email": st.session_state.email})
 
     if not user:
         st.error("User profile not found.")
@@ -32,4 +35,5 @@ def profile_page():
             {"email": st.session_state.email},
             {"$set": updated_data}
         )
+        invalidate_patient_context(st.session_state.email)
         st.success("✅ Profile updated successfully.")